@@ -0,0 +1,159 @@
+"""
+Assessment generation behind `/assessment/generate`: prompt, Gemini call and
+validation of the returned quiz.
+
+Provides:
+- THEMES                                   -> themes picked from when none is given
+- build_prompt(theme, num, journal)
+- validate(parsed, num=None)               -> {"assessment", "questions", "raw"}
+- generate(theme, num, journal="", ...)    -> same, or raises AssessmentError
+"""
+
+import asyncio
+import json
+import os
+import re
+from typing import Optional
+
+import requests
+
+from rag.gemini_client import ask_gemini_async
+from rag.gemini_scheduler import BACKGROUND
+from rag.llm_cache import ask_gemini_cached
+from utils import metrics
+
+THEMES = [
+    'historical trivia',
+    'fun facts and puzzles',
+    'mindfulness and self-care',
+    'gratitude and reflection',
+    'healthy habits and routines',
+    'light games and challenges',
+    'creative prompts and storytelling'
+]
+
+
+class AssessmentError(Exception):
+    """Gemini failed or returned no usable assessment; `body` is the 502 JSON."""
+
+    def __init__(self, error: str, **details):
+        super().__init__(error)
+        self.body = {"error": error, **details}
+
+
+def build_prompt(theme: str, num: int, journal: str = '') -> str:
+    return (
+        "Return ONLY valid JSON. Do not include explanations, markdown, or extra text.\n\n"
+
+        "You are creating a short, fun, and interactive self-assessment based on a user's recent journal entries.\n\n"
+
+        "Input context:\n"
+        "- Journal entries may include thoughts, emotions, activities, struggles, wins, or reflections from the last 2 days.\n"
+        "- If journal entries are provided and contain meaningful content, tailor the assessment questions directly to those themes.\n"
+        "- If journal entries are missing, empty, or meaningless, generate a general but fun self-assessment suitable for anyone.\n\n"
+
+        "Tone and style rules:\n"
+        "- Keep the tone friendly, light, and engaging.\n"
+        "- Questions should feel like a game or reflection quiz, not an exam.\n"
+        "- Avoid clinical or judgmental language.\n"
+        "- Make options relatable, human, and easy to choose from.\n\n"
+
+        "JSON structure rules:\n"
+        "- Return one object with keys:\n"
+        "  - title (string)\n"
+        "  - questions (array)\n"
+        "- Each question must be an object with:\n"
+        "  - title (string)\n"
+        "  - options (array of exactly 4 strings)\n"
+        "  - correctAnswer (must exactly match one option)\n"
+        f"- Generate exactly {num} questions.\n\n"
+
+        "Content rules:\n"
+        "- Questions should gently reinforce self-awareness, mood, habits, or mindset.\n"
+        "- Correct answers should reflect the healthiest, most constructive, or most self-aware choice — but never shame the user.\n\n"
+
+        f"Theme: {theme}\n"
+        f"Journal entries (last 2 days): {journal}\n\n"
+
+        "Return ONLY the JSON object."
+    )
+
+
+def validate(parsed: dict, num: Optional[int] = None) -> dict:
+    """Keep the well-formed questions; with `num`, require that many and keep exactly that many."""
+    # locate title and questions
+    title = parsed.get('title') or (parsed.get('assessment') and isinstance(parsed.get('assessment'), dict) and parsed.get('assessment').get('title'))
+    questions = parsed.get('questions')
+    if not title or not isinstance(questions, list):
+        raise AssessmentError("AI returned invalid assessment structure", raw=parsed)
+
+    valid_questions = []
+    for q in questions:
+        if not isinstance(q, dict):
+            continue
+        qtitle = q.get('title') or q.get('question')
+        options = q.get('options')
+        correct = q.get('correctAnswer') or q.get('correct') or q.get('answer')
+        if not qtitle or not isinstance(options, list) or len(options) != 4:
+            continue
+        if not correct or correct not in options:
+            continue
+        valid_questions.append({"title": qtitle, "options": options, "correctAnswer": correct})
+
+    if len(valid_questions) == 0:
+        raise AssessmentError("No valid questions produced by AI", raw=parsed)
+    if num is not None:
+        if len(valid_questions) < num:
+            raise AssessmentError(f"AI produced {len(valid_questions)} valid questions, expected {num}", raw=parsed)
+        valid_questions = valid_questions[:num]
+
+    return {"assessment": {"title": title}, "questions": valid_questions, "raw": parsed}
+
+
+async def _ask(prompt: str, cached: bool, priority: str):
+    """(raw text, parsed JSON or None) from Gemini, or from `GEMINI_URL` if the SDK call fails."""
+    try:
+        if cached:
+            return await ask_gemini_cached(prompt, priority=priority), None
+        return await ask_gemini_async(prompt, priority=priority), None
+    except Exception as e:
+        GEMINI_URL = os.environ.get('GEMINI_URL')
+        GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
+        if not GEMINI_URL:
+            raise AssessmentError("Gemini client failed", details=str(e)) from e
+        headers = {"Content-Type": "application/json"}
+        if GEMINI_API_KEY:
+            headers["Authorization"] = f"Bearer {GEMINI_API_KEY}"
+        try:
+            resp = await asyncio.to_thread(requests.post, GEMINI_URL, json={"prompt": prompt}, headers=headers, timeout=20)
+            try:
+                return None, resp.json()
+            except Exception:
+                return resp.text, None
+        except Exception as e2:
+            raise AssessmentError("Gemini request failed", details=str(e2)) from e2
+
+
+async def generate(theme: str, num: int, journal: str = '', cached: bool = True,
+                   priority: str = BACKGROUND, exact: bool = False) -> dict:
+    """Ask Gemini for an assessment and validate it.
+
+    `cached=False` skips the response cache so repeated calls give different
+    quizzes (the pool refiller); `exact=True` requires exactly `num` questions.
+    """
+    raw, parsed = await _ask(build_prompt(theme, num, journal), cached, priority)
+
+    # If parsed not set, try to extract JSON from raw text
+    if parsed is None and raw:
+        with metrics.timer("json_extract_seconds", tags={"endpoint": "assessment"}):
+            m = re.search(r"\{[\s\S]*\}", raw)
+            if m:
+                try:
+                    parsed = json.loads(m.group(0))
+                except Exception:
+                    parsed = None
+
+    if not isinstance(parsed, dict):
+        raise AssessmentError("Unable to parse JSON from Gemini response", raw=raw)
+
+    return validate(parsed, num if exact else None)
@@ -0,0 +1,12 @@
+from .generator import THEMES, AssessmentError, build_prompt, generate, validate
+from .pool import AssessmentPool, get_pool
+
+__all__ = [
+    "THEMES",
+    "AssessmentError",
+    "build_prompt",
+    "generate",
+    "validate",
+    "AssessmentPool",
+    "get_pool"
+]
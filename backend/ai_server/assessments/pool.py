@@ -0,0 +1,226 @@
+"""
+Pool of pre-generated assessments for `/assessment/generate` requests without
+journal data.
+
+Such requests only depend on (theme, numQuestions), so a background task keeps
+up to `ASSESSMENT_POOL_SIZE` validated assessments ready for every theme in
+`THEMES` and every count in `ASSESSMENT_POOL_QUESTION_COUNTS`. A request takes
+one and wakes the refiller, which tops the emptiest slot up with
+background-priority Gemini calls that bypass the response cache. A failed or
+duplicate generation backs off for `ASSESSMENT_POOL_RETRY_SECONDS`.
+
+The pool lives in `ASSESSMENT_POOL_PATH`, shared by the workers on one host:
+- take/put reload the file, change it and atomically replace it while holding
+  an exclusive lock on `<path>.lock`, so each assessment is served exactly once
+- only the worker holding `<path>.refill.lock` refills; the others retry for
+  the role every `ASSESSMENT_POOL_RETRY_SECONDS`
+- file work runs in a thread, off the event loop
+A restart serves from the saved stock while the refiller catches up.
+"""
+
+import asyncio
+import json
+import logging
+import random
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    # No flock (Windows): run a single worker
+    fcntl = None
+
+from config import (
+    ASSESSMENT_POOL_PATH,
+    ASSESSMENT_POOL_QUESTION_COUNTS,
+    ASSESSMENT_POOL_RETRY_SECONDS,
+    ASSESSMENT_POOL_SIZE,
+)
+from assessments.generator import THEMES
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+Slot = Tuple[str, int]
+
+
+class AssessmentPool:
+    def __init__(self, path: str = ASSESSMENT_POOL_PATH, size: int = ASSESSMENT_POOL_SIZE,
+                 counts: List[int] = ASSESSMENT_POOL_QUESTION_COUNTS, themes: List[str] = THEMES):
+        self.path = path
+        self.size = size
+        # This worker's view of the file as of the last read or write
+        self._slots: Dict[Slot, deque] = {(theme, num): deque() for theme in themes for num in counts}
+        self._lock = threading.Lock()
+        self._refill_lock = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+        for theme, num in self._slots:
+            metrics.register_gauge("assessment_pool_items", lambda slot=(theme, num): len(self._slots[slot]),
+                                   tags={"theme": theme, "questions": num})
+
+    def slot(self, theme: Optional[str], num: int) -> Optional[Slot]:
+        """The pooled slot for a request, None if it is not pooled. No theme = a random stocked one."""
+        if theme:
+            key = (theme.strip().lower(), num)
+            return key if key in self._slots else None
+        stocked = [key for key, items in self._slots.items() if key[1] == num and items]
+        if stocked:
+            return random.choice(stocked)
+        pooled = [key for key in self._slots if key[1] == num]
+        return random.choice(pooled) if pooled else None
+
+    async def take(self, slot: Slot) -> Optional[dict]:
+        """Claim the oldest assessment of `slot` (None when empty) and wake the refiller."""
+        assessment = await asyncio.to_thread(self._take, slot)
+        metrics.increment("assessment_pool_requests_total", tags={"result": "hit" if assessment else "miss"})
+        if self._wake is not None:
+            self._wake.set()
+        return assessment
+
+    async def put(self, slot: Slot, assessment: dict) -> bool:
+        """Add a generated assessment; False if the slot is full or already has the same one."""
+        return await asyncio.to_thread(self._put, slot, assessment)
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive across threads and, with flock, across the workers sharing the file."""
+        with self._lock, open(self.path + ".lock", "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def _take(self, slot: Slot) -> Optional[dict]:
+        with self._locked():
+            slots = self._read()
+            assessment = slots[slot].popleft() if slots[slot] else None
+            if assessment is not None:
+                self._write(slots)
+        self._slots.update(slots)
+        return assessment
+
+    def _put(self, slot: Slot, assessment: dict) -> bool:
+        with self._locked():
+            slots = self._read()
+            items = slots[slot]
+            added = len(items) < self.size and all(a["questions"] != assessment["questions"] for a in items)
+            if added:
+                items.append(assessment)
+                self._write(slots)
+        self._slots.update(slots)
+        return added
+
+    def load(self):
+        """Refresh this worker's view from the file."""
+        self._slots.update(self._read())
+
+    def _read(self) -> Dict[Slot, deque]:
+        """The saved pool (a missing or unreadable file is an empty one)."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            saved = {}
+        except (OSError, ValueError) as e:
+            logger.warning("⚠️ Ignoring unreadable assessment pool %s: %s", self.path, e)
+            saved = {}
+        slots = {key: deque() for key in self._slots}
+        # Themes or counts no longer configured are dropped
+        for entry in saved.get("slots", []):
+            key = (entry.get("theme"), entry.get("questions"))
+            if key in slots:
+                slots[key] = deque(entry.get("assessments", [])[:self.size])
+        return slots
+
+    def _write(self, slots: Dict[Slot, deque]):
+        from vector_db.faiss_client import atomic_replace
+
+        saved = [
+            {"theme": theme, "questions": num, "assessments": list(items)}
+            for (theme, num), items in slots.items()
+        ]
+
+        def write(tmp):
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"slots": saved}, f, ensure_ascii=False)
+        atomic_replace(self.path, write)
+
+    def _lead(self) -> bool:
+        """Try to become this host's refiller; held until `stop()` or the process exits."""
+        if fcntl is None:
+            return True
+        f = open(self.path + ".refill.lock", "a")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self._refill_lock = f
+        return True
+
+    def _emptiest(self) -> Optional[Slot]:
+        missing = [key for key, items in self._slots.items() if len(items) < self.size]
+        return min(missing, key=lambda key: len(self._slots[key])) if missing else None
+
+    async def refill(self, generate: Callable[[str, int], Awaitable[dict]]):
+        """Keep every slot full, one generation at a time; runs until cancelled."""
+        self._wake = asyncio.Event()
+        await asyncio.to_thread(self.load)
+        logger.info("🧩 Assessment pool loaded: %d ready.", sum(map(len, self._slots.values())))
+        while not await asyncio.to_thread(self._lead):
+            # Another worker refills; keep this worker's view fresh meanwhile
+            await asyncio.sleep(ASSESSMENT_POOL_RETRY_SECONDS)
+            await asyncio.to_thread(self.load)
+
+        while True:
+            # Other workers take from the file too
+            await asyncio.to_thread(self.load)
+            slot = self._emptiest()
+            if slot is None:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), ASSESSMENT_POOL_RETRY_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+                continue
+            try:
+                added = await self.put(slot, await generate(*slot))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                metrics.increment("assessment_pool_refills_total", tags={"result": "error"})
+                logger.warning("⚠️ Assessment pool refill failed for %s/%d: %s", slot[0], slot[1], e)
+                await asyncio.sleep(ASSESSMENT_POOL_RETRY_SECONDS)
+                continue
+            metrics.increment("assessment_pool_refills_total", tags={"result": "ok" if added else "duplicate"})
+            if not added:
+                await asyncio.sleep(ASSESSMENT_POOL_RETRY_SECONDS)
+
+    def start(self, generate: Callable[[str, int], Awaitable[dict]]) -> asyncio.Task:
+        """Start the refiller on the running event loop (once); it loads the saved pool first."""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.refill(generate))
+        return self._task
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._refill_lock is not None:
+            self._refill_lock.close()
+            self._refill_lock = None
+
+
+_pool: Optional[AssessmentPool] = None
+
+
+def get_pool() -> Optional[AssessmentPool]:
+    """The process-wide pool; None when `ASSESSMENT_POOL_SIZE` is 0 (pool off)."""
+    global _pool
+    if _pool is None and ASSESSMENT_POOL_SIZE > 0 and ASSESSMENT_POOL_QUESTION_COUNTS:
+        _pool = AssessmentPool()
+    return _pool
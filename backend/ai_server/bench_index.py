@@ -0,0 +1,129 @@
+"""
+Compare FAISS index types on the seeded corpus: recall@k against exact search,
+single-query latency and memory footprint (serialized size, bytes per vector).
+
+    python bench_index.py                      # all types, default sweeps
+    python bench_index.py --types hnsw ivf_pq --k 5 --queries 500
+    python bench_index.py --types sq_fp16 sq_int8 pq --refine   # quantized, with and without re-rank
+
+Vectors come from the published shards (or are re-embedded from their document
+stores when a shard's index is lossy, e.g. IVF-PQ), pooled into one corpus. Held-out vectors are used as
+queries; recall@k is the overlap of each index's top-k with the flat top-k.
+"""
+
+import argparse
+import time
+
+import faiss
+import numpy as np
+
+from vector_db.faiss_client import get_vector_store
+from vector_db.index_factory import (
+    apply_search_params, build_index, train_index, index_ids, stores_exact_vectors, INDEX_TYPES, LOSSY_TYPES,
+)
+
+NPROBE_SWEEP = [1, 4, 8, 16, 32, 64]
+EF_SEARCH_SWEEP = [16, 32, 64, 128, 256]
+
+
+def shard_vectors(shard):
+    """(vectors, ids) of one shard."""
+    index = shard.index
+    if stores_exact_vectors(index):
+        ids = index_ids(index)
+        if isinstance(index, faiss.IndexIDMap):
+            return index.index.reconstruct_n(0, index.ntotal), ids
+        return index.reconstruct_batch(ids), ids
+
+    from rag.embedder import embed_batch
+    ids = np.asarray(list(shard.documents), dtype="int64")
+    print(f"🔄 Re-embedding {len(ids)} documents of {shard.name} (its index is not exact)...")
+    return embed_batch([shard.documents[int(i)]["text"] for i in ids], show_progress_bar=True), ids
+
+
+def corpus_vectors():
+    """(vectors, ids) of everything currently indexed, across all shards."""
+    parts = [shard_vectors(s) for s in get_vector_store().refresh(force=True).shards.values() if s.index.ntotal]
+    if not parts:
+        return np.zeros((0, 0), dtype="float32"), np.zeros(0, dtype="int64")
+    return np.vstack([v for v, _ in parts]), np.concatenate([i for _, i in parts])
+
+
+def index_size(index) -> int:
+    return faiss.serialize_index(index).nbytes
+
+
+def run(index, queries, k):
+    """Top-k ids per query plus per-query latencies (ms), one query at a time."""
+    results, latencies = [], []
+    for q in queries:
+        start = time.perf_counter()
+        _, ids = index.search(q[None, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(ids[0])
+    return np.vstack(results), np.asarray(latencies)
+
+
+def recall(found, truth):
+    k = truth.shape[1]
+    return float(np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def report(name, index, queries, truth, k, **search):
+    apply_search_params(index, **search)
+    found, latencies = run(index, queries, k)
+    knob = ", ".join(f"{key}={value}" for key, value in search.items()) or "-"
+    size = index_size(index)
+    print(f"{name:<14} {knob:<14} {recall(found, truth):>8.3f} "
+          f"{np.percentile(latencies, 50):>9.3f} {np.percentile(latencies, 99):>9.3f} "
+          f"{size / 2**20:>9.1f} {size / max(index.ntotal, 1):>7.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--types", nargs="+", choices=INDEX_TYPES, default=list(INDEX_TYPES))
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200, help="vectors held out as queries")
+    parser.add_argument("--refine", action="store_true", help="also run lossy types with exact re-ranking")
+    args = parser.parse_args()
+
+    vectors, ids = corpus_vectors()
+    if len(vectors) <= args.queries:
+        raise SystemExit("❌ Corpus too small to benchmark; seed more documents first.")
+    rng = np.random.default_rng(0)
+    held_out = rng.choice(len(vectors), args.queries, replace=False)
+    mask = np.ones(len(vectors), dtype=bool)
+    mask[held_out] = False
+    queries, base, base_ids = vectors[held_out], vectors[mask], ids[mask]
+    print(f"📊 {len(base)} vectors, {len(queries)} queries, recall@{args.k} vs exact search\n")
+
+    flat = build_index(base.shape[1], index_type="flat")
+    flat.add_with_ids(base, base_ids)
+    _, truth = flat.search(queries, args.k)
+
+    print(f"{'type':<14} {'params':<14} {'recall':>8} {'p50 ms':>9} {'p99 ms':>9} {'size MB':>9} {'B/vec':>7}")
+    variants = [(t, False) for t in args.types]
+    if args.refine:
+        variants += [(t, True) for t in args.types if t in LOSSY_TYPES]
+    for index_type, refine in variants:
+        name = index_type + ("+refine" if refine else "")
+        index = build_index(base.shape[1], n_vectors=len(base), index_type=index_type, refine=refine)
+        start = time.perf_counter()
+        train_index(index, base)
+        index.add_with_ids(base, base_ids)
+        build_s = time.perf_counter() - start
+
+        if index_type == "hnsw":
+            for ef in EF_SEARCH_SWEEP:
+                report(name, index, queries, truth, args.k, ef_search=ef)
+        elif index_type.startswith("ivf_"):
+            nlist = faiss.extract_index_ivf(index).nlist
+            for nprobe in [p for p in NPROBE_SWEEP if p <= nlist]:
+                report(name, index, queries, truth, args.k, nprobe=nprobe)
+        else:
+            report(name, index, queries, truth, args.k)
+        print(f"{'':<14} built in {build_s:.1f}s\n")
+
+
+if __name__ == "__main__":
+    main()
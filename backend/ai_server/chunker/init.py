@@ -1,3 +1,3 @@
-from .text_chunker import chunk_text
+from .text_chunker import chunk_text, chunk_texts
 
-__all__ = ["chunk_text"]
+__all__ = ["chunk_text", "chunk_texts"]
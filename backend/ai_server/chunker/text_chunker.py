@@ -1,9 +1,143 @@
-def chunk_text(text, chunk_size=500):
-    words = text.split()
-    chunks = []
+"""
+Token-aware text chunker.
 
-    for i in range(0, len(words), chunk_size):
-        chunk = " ".join(words[i:i + chunk_size])
-        chunks.append(chunk)
+all-MiniLM-L6-v2 truncates its input at 256 word-pieces, so any text past
+that point is tokenized, thrown away and can never be retrieved. Chunks are
+therefore measured with the embedding model's own tokenizer and packed up to
+`CHUNK_MAX_TOKENS` (special tokens included) from whole sentences, breaking at
+paragraph and sentence boundaries. Consecutive chunks of one document share up
+to `CHUNK_OVERLAP_TOKENS` tokens of trailing sentences. Sentences that alone
+exceed the budget are cut at token boundaries.
 
-    return chunks
+Provides:
+- chunk_text(text)     generator of chunks for one (possibly huge) document
+- chunk_texts(texts)   fast path for many short texts (e.g. CSV rows): one
+                       batched tokenizer call, texts that fit are kept whole
+"""
+
+import re
+from typing import Iterable, Iterator, List, Optional
+
+from config import CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS
+from rag.embedder import get_tokenizer
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+|\n")
+# Sentences tokenized per tokenizer call, so huge documents are never tokenized at once
+SENTENCE_BLOCK = 256
+
+
+def _iter_split(pattern, text) -> Iterator[str]:
+    start = 0
+    for m in pattern.finditer(text):
+        yield text[start:m.start()]
+        start = m.end()
+    yield text[start:]
+
+
+def _sentences(text: str) -> Iterator[tuple]:
+    """Yield (sentence, starts_new_paragraph) without materializing the split."""
+    for paragraph in _iter_split(_PARAGRAPH_BREAK, text):
+        first = True
+        for sentence in _iter_split(_SENTENCE_BREAK, paragraph):
+            sentence = " ".join(sentence.split())
+            if sentence:
+                yield sentence, first
+                first = False
+
+
+def _budget(tokenizer, max_tokens: int) -> int:
+    return max(1, max_tokens - tokenizer.num_special_tokens_to_add())
+
+
+def _split_long(tokenizer, sentence: str, budget: int) -> Iterator[tuple]:
+    """Cut one over-long sentence into (piece, n_tokens) at token boundaries."""
+    enc = tokenizer(sentence, add_special_tokens=False, return_offsets_mapping=True)
+    offsets = enc["offset_mapping"]
+    for start in range(0, len(offsets), budget):
+        window = offsets[start:start + budget]
+        yield sentence[window[0][0]:window[-1][1]], len(window)
+
+
+class _Packer:
+    """Greedily packs sentences into chunks of at most `budget` tokens, with overlap."""
+
+    def __init__(self, budget: int, overlap: int):
+        self.budget = budget
+        self.overlap = overlap
+        self.parts: List[tuple] = []  # (text, n_tokens, starts_new_paragraph)
+        self.tokens = 0
+
+    def _emit(self) -> str:
+        out = self.parts[0][0]
+        for text, _, new_paragraph in self.parts[1:]:
+            out += ("\n\n" if new_paragraph else " ") + text
+        return out
+
+    def _carry_overlap(self):
+        kept, tokens = [], 0
+        for part in reversed(self.parts):
+            if tokens + part[1] > self.overlap:
+                break
+            kept.append(part)
+            tokens += part[1]
+        self.parts, self.tokens = kept[::-1], tokens
+
+    def add(self, text: str, n_tokens: int, new_paragraph: bool) -> Iterator[str]:
+        if self.parts and self.tokens + n_tokens > self.budget:
+            yield self._emit()
+            self._carry_overlap()
+            if self.tokens + n_tokens > self.budget:
+                self.parts, self.tokens = [], 0
+        self.parts.append((text, n_tokens, new_paragraph))
+        self.tokens += n_tokens
+
+    def flush(self) -> Iterator[str]:
+        # Every add() appends a new sentence after emitting, so the remainder
+        # is never just the previous chunk's overlap
+        if self.parts:
+            yield self._emit()
+
+
+def chunk_text(text: str, max_tokens: Optional[int] = None, overlap_tokens: Optional[int] = None,
+               tokenizer=None) -> Iterator[str]:
+    """Yield chunks of `text` of at most `max_tokens` model tokens each."""
+    tokenizer = tokenizer or get_tokenizer()
+    budget = _budget(tokenizer, max_tokens or CHUNK_MAX_TOKENS)
+    overlap = min(CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens, budget // 2)
+    packer = _Packer(budget, overlap)
+
+    sentences = _sentences(text or "")
+    while True:
+        block = [s for _, s in zip(range(SENTENCE_BLOCK), sentences)]
+        if not block:
+            break
+        counts = tokenizer([s for s, _ in block], add_special_tokens=False)["input_ids"]
+        for (sentence, new_paragraph), ids in zip(block, counts):
+            if len(ids) > budget:
+                for i, (piece, n) in enumerate(_split_long(tokenizer, sentence, budget)):
+                    yield from packer.add(piece, n, new_paragraph and i == 0)
+            else:
+                yield from packer.add(sentence, len(ids), new_paragraph)
+
+    yield from packer.flush()
+
+
+def chunk_texts(texts: Iterable[str], max_tokens: Optional[int] = None, overlap_tokens: Optional[int] = None,
+                tokenizer=None) -> Iterator[List[str]]:
+    """Chunk many texts; yields one list of chunks per input text, in order.
+
+    All texts are measured with a single batched tokenizer call; the ones that
+    fit the budget are returned whole and only the rest go through `chunk_text`.
+    """
+    tokenizer = tokenizer or get_tokenizer()
+    budget = _budget(tokenizer, max_tokens or CHUNK_MAX_TOKENS)
+    texts = [" ".join((t or "").split()) for t in texts]
+    counts = tokenizer(texts, add_special_tokens=False)["input_ids"] if texts else []
+    for text, ids in zip(texts, counts):
+        if not text:
+            yield []
+        elif len(ids) <= budget:
+            yield [text]
+        else:
+            yield list(chunk_text(text, max_tokens, overlap_tokens, tokenizer))
@@ -9,11 +9,103 @@ SUPPORTED = [".txt", ".md", ".pdf", ".docx", ".csv"]
 # Where your raw documents will be stored
 DOCS_DIR = "docs"
 
+# Seeding pipeline: loader processes (0 = one per CPU), embed batch size, index write slice
+SEED_WORKERS = int(os.getenv("SEED_WORKERS", "0"))
+SEED_EMBED_BATCH_SIZE = int(os.getenv("SEED_EMBED_BATCH_SIZE", "64"))
+SEED_FLUSH_SIZE = int(os.getenv("SEED_FLUSH_SIZE", "1024"))
+
 # Embedding model
 EMBED_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+# all-MiniLM-L6-v2 truncates input at 256 word-pieces; chunks are sized to fit
+EMBED_MAX_TOKENS = int(os.getenv("EMBED_MAX_TOKENS", "256"))
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", str(EMBED_MAX_TOKENS)))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+# Batch size for document/batch encodes and size of the query-embedding LRU cache
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "1024"))
+# Micro-batching of concurrent query embeddings: max wait window and batch size
+EMBED_BATCH_WAIT_MS = float(os.getenv("EMBED_BATCH_WAIT_MS", "5"))
+EMBED_BATCH_MAX_SIZE = int(os.getenv("EMBED_BATCH_MAX_SIZE", "32"))
+
+# FAISS index structure: "flat" (exact), "hnsw", "ivf_flat" or "ivf_pq" (see vector_db/index_factory.py)
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat")
+FAISS_HNSW_M = int(os.getenv("FAISS_HNSW_M", "32"))
+FAISS_HNSW_EF_CONSTRUCTION = int(os.getenv("FAISS_HNSW_EF_CONSTRUCTION", "40"))
+FAISS_HNSW_EF_SEARCH = int(os.getenv("FAISS_HNSW_EF_SEARCH", "64"))
+FAISS_IVF_NLIST = int(os.getenv("FAISS_IVF_NLIST", "0"))  # 0 = ~4*sqrt(corpus size)
+FAISS_IVF_NPROBE = int(os.getenv("FAISS_IVF_NPROBE", "8"))
+FAISS_PQ_M = int(os.getenv("FAISS_PQ_M", "48"))
+FAISS_PQ_NBITS = int(os.getenv("FAISS_PQ_NBITS", "8"))
+FAISS_TRAIN_SAMPLE = int(os.getenv("FAISS_TRAIN_SAMPLE", "50000"))
+# Keep float32 vectors next to lossy codes (sq_*, pq, ivf_pq) and re-rank the top k * K_FACTOR exactly
+FAISS_REFINE = os.getenv("FAISS_REFINE", "false").lower() in ("1", "true", "yes")
+FAISS_REFINE_K_FACTOR = float(os.getenv("FAISS_REFINE_K_FACTOR", "4"))
+
+# How often (seconds) a running server checks for a newly seeded FAISS index
+FAISS_RELOAD_INTERVAL = float(os.getenv("FAISS_RELOAD_INTERVAL", "2"))
+# Threads searching shards in parallel (0 = min(8, CPUs))
+FAISS_SEARCH_THREADS = int(os.getenv("FAISS_SEARCH_THREADS", "0"))
+
+# Gemini response cache: backend ("memory", "sqlite" or "off"), TTL seconds, max entries
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "memory")
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "3600"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2048"))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite3")
+
+# Opt-in semantic answer cache for /chat (cosine similarity threshold, capacity)
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+
+# RAG context packing (rag/context_packer.py): FAISS candidates per question, chunks kept,
+# context budget in tokens, MMR trade-off (1 = relevance only, lower = more diverse), and
+# the cosine similarity at which a chunk is dropped as a near-duplicate of one already kept
+RAG_CANDIDATES = int(os.getenv("RAG_CANDIDATES", "20"))
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "5"))
+RAG_CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", "600"))
+RAG_MMR_LAMBDA = float(os.getenv("RAG_MMR_LAMBDA", "0.7"))
+RAG_DUPLICATE_SIMILARITY = float(os.getenv("RAG_DUPLICATE_SIMILARITY", "0.95"))
+
+# Batch endpoints: max texts per request, and journal entries packed into one Gemini call by /score/batch
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+SCORE_BATCH_SIZE = int(os.getenv("SCORE_BATCH_SIZE", "20"))
+
+# Local mood classifier artifact (train with `python train_mood.py`). With a threshold > 0,
+# /score answers locally when the calibrated confidence (percent) reaches it and asks Gemini otherwise
+MOOD_MODEL_PATH = os.getenv("MOOD_MODEL_PATH", "mood_classifier.npz")
+MOOD_SCORE_THRESHOLD = float(os.getenv("MOOD_SCORE_THRESHOLD", "0"))
+
+# On-demand request profiling (utils/profiling.py). A request is profiled when it sends
+# `X-Profile: <PROFILE_TOKEN>` or is picked at PROFILE_SAMPLE_RATE (0-1); both off by default.
+# Mode "sample" writes folded stacks of all threads (flame graph), "cprofile" a .pstats file
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_MODE = os.getenv("PROFILE_MODE", "sample")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_MAX_ARTIFACTS = int(os.getenv("PROFILE_MAX_ARTIFACTS", "100"))
+
+# Log level for the API server; request/answer payloads are only logged at DEBUG
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
 
-# Gemini API Key
+# Gemini API Key; checked by the warmup (see /readyz) rather than at import
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+# More keys (comma-separated) pooled with GEMINI_API_KEY by rag/gemini_scheduler.py
+GEMINI_API_KEYS = [k.strip() for k in os.getenv("GEMINI_API_KEYS", "").split(",") if k.strip()]
+# Per-key request budget (token bucket): requests per minute (0 = unlimited) and burst size
+GEMINI_RPM_PER_KEY = float(os.getenv("GEMINI_RPM_PER_KEY", "0"))
+GEMINI_BURST_PER_KEY = int(os.getenv("GEMINI_BURST_PER_KEY", "5"))
+# Share of each key's burst that background calls (scoring, assessments) leave for chat
+GEMINI_INTERACTIVE_RESERVE = float(os.getenv("GEMINI_INTERACTIVE_RESERVE", "0.2"))
+# Retries on quota errors (ResourceExhausted / 429); the key rests with jittered exponential backoff
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "3"))
+GEMINI_BACKOFF_BASE = float(os.getenv("GEMINI_BACKOFF_BASE", "1"))
+GEMINI_BACKOFF_MAX = float(os.getenv("GEMINI_BACKOFF_MAX", "30"))
 
-if not GEMINI_API_KEY:
-    raise ValueError("❌ GEMINI_API_KEY not found in environment variables")
+# Pre-generated assessments for /assessment/generate requests without journal data
+# (assessments/pool.py): assessments kept per theme and question count (0 = off), the
+# question counts to keep ready, the file the pool is saved to, and the wait after a failed refill
+ASSESSMENT_POOL_SIZE = int(os.getenv("ASSESSMENT_POOL_SIZE", "0"))
+ASSESSMENT_POOL_QUESTION_COUNTS = [int(n) for n in os.getenv("ASSESSMENT_POOL_QUESTION_COUNTS", "5").split(",") if n.strip()]
+ASSESSMENT_POOL_PATH = os.getenv("ASSESSMENT_POOL_PATH", "assessment_pool.json")
+ASSESSMENT_POOL_RETRY_SECONDS = float(os.getenv("ASSESSMENT_POOL_RETRY_SECONDS", "60"))
@@ -1,34 +1,150 @@
+import codecs
+import csv
+import io
+import logging
+
 import pandas as pd
 
-def load_csv(path):
-    # Try common delimiters
-    possible_delimiters = [",", ";", "\t", "|"]
+logger = logging.getLogger(__name__)
+
+# Candidate delimiters, in order of preference on ties
+DELIMITERS = [",", ";", "\t", "|"]
+ENCODINGS = ["utf-8", "cp1252", "latin1"]
+# Columns kept as metadata instead of being embedded ("labels" → "label")
+METADATA_COLUMNS = {"label": "label", "labels": "label", "hashtags": "hashtags"}
+# Preferred text columns; if none is present every non-metadata column is used
+TEXT_COLUMNS = ["text", "title", "body", "content"]
+
+SAMPLE_BYTES = 64 * 1024
+CHUNK_ROWS = 10_000
+
+
+def _sniff_encoding(sample: bytes) -> str:
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    for enc in ENCODINGS:
+        try:
+            # final=False: a multi-byte char cut off at the end of the sample is fine
+            codecs.getincrementaldecoder(enc)().decode(sample, final=False)
+            return enc
+        except UnicodeDecodeError:
+            continue
+    return "latin1"
+
+
+def _sniff_delimiter(text: str) -> str:
+    """Pick the delimiter that splits the sample lines into a consistent field count.
+
+    csv.Sniffer is fooled by free text full of commas; consistency with the
+    header's field count is not.
+    """
+    lines = text.splitlines()[:50]
+    if len(lines) > 1:
+        lines = lines[:-1]  # the sample may end mid-line
+    best, best_score = ",", -1.0
+    for delim in DELIMITERS:
+        rows = list(csv.reader(io.StringIO("\n".join(lines)), delimiter=delim))
+        if not rows or len(rows[0]) < 2:
+            continue
+        width = len(rows[0])
+        score = sum(1 for r in rows if len(r) == width) / len(rows)
+        if score > best_score:
+            best, best_score = delim, score
+    return best
+
 
-    for delim in possible_delimiters:
+def sniff_csv(path):
+    """Return (delimiter, encoding) from a small sample of the file."""
+    with open(path, "rb") as f:
+        sample = f.read(SAMPLE_BYTES)
+    encoding = _sniff_encoding(sample)
+    delimiter = _sniff_delimiter(sample.decode(encoding, errors="ignore"))
+    return delimiter, encoding
+
+
+def _read_chunks(path, chunksize=CHUNK_ROWS):
+    """DataFrame slices of the file.
+
+    The encoding is sniffed from the first `SAMPLE_BYTES` only; if a byte
+    further down does not decode, the file is read again with the next
+    encoding in `ENCODINGS`, skipping the rows already yielded.
+    """
+    delimiter, encoding = sniff_csv(path)
+    encodings = [encoding, *ENCODINGS[ENCODINGS.index(encoding.replace("-sig", "")) + 1:]]
+    names = None  # header of the first read, so a re-read keeps the same columns
+    done = 0
+    for attempt, enc in enumerate(encodings):
+        skip = done
         try:
-            df = pd.read_csv(path, delimiter=delim, encoding="utf-8", engine="python")
-            break
-        except Exception:
-            df = None
-
-    # Try fallback encodings
-    if df is None:
-        fallback_encodings = ["latin1", "cp1252"]
-        for enc in fallback_encodings:
             try:
-                df = pd.read_csv(path, delimiter=delim, encoding=enc, engine="python")
-                break
-            except Exception:
-                df = None
+                reader = pd.read_csv(
+                    path, sep=delimiter, encoding=enc, engine="c", chunksize=chunksize,
+                    dtype=str, keep_default_na=False, on_bad_lines="skip", header=0, names=names,
+                )
+            except UnicodeDecodeError:
+                raise
+            except Exception as e:
+                raise Exception(f"❌ Could not read CSV file: {path}") from e
+
+            for df in reader:
+                if names is None:
+                    names = list(df.columns)
+                if skip:
+                    dropped = min(skip, len(df))
+                    df, skip = df.iloc[dropped:], skip - dropped
+                    if df.empty:
+                        continue
+                done += len(df)
+                # Drop the empty trailing columns exports leave behind (";;;")
+                df = df.loc[:, [c for c in df.columns if not str(c).startswith("Unnamed:")]]
+                yield df
+            return
+        except UnicodeDecodeError as e:
+            if attempt == len(encodings) - 1:
+                raise Exception(f"❌ Could not decode CSV file: {path}") from e
+            logger.warning("⚠️ %s is not %s after row %d; re-reading as %s.", path, enc, done, encodings[attempt + 1])
+
+
+def _join_columns(df, cols):
+    """Vectorized row → text: one column as-is, several joined with ' | '."""
+    texts = df[cols[0]].str.strip()
+    if len(cols) > 1:
+        texts = texts.str.cat([df[c].str.strip() for c in cols[1:]], sep=" | ")
+    return texts
 
-    if df is None:
-        raise Exception(f"❌ Could not read CSV file: {path}")
 
-    # Convert CSV rows into plain text lines
-    text_lines = []
+def _row_texts(df):
+    by_name = {str(c).lower(): c for c in df.columns}
+    for name in TEXT_COLUMNS:
+        if name in by_name:
+            return _join_columns(df, [by_name[name]])
+    cols = [c for c in df.columns if str(c).lower() not in METADATA_COLUMNS] or list(df.columns)
+    return _join_columns(df, cols)
 
-    for _, row in df.iterrows():
-        row_text = " | ".join([str(v) for v in row.values])
-        text_lines.append(row_text)
 
-    return "\n".join(text_lines)
+def load_csv_rows(path, chunksize=CHUNK_ROWS):
+    """Yield one document per non-empty row: {"text": ..., "metadata": {"label": ..., ...}}.
+
+    The file is read in `chunksize`-row slices with the C parser, so memory
+    stays flat however large the export is.
+    """
+    for df in _read_chunks(path, chunksize):
+        if df.empty or len(df.columns) == 0:
+            continue
+        texts = _row_texts(df).tolist()
+        meta_cols = {c: METADATA_COLUMNS[str(c).lower()] for c in df.columns if str(c).lower() in METADATA_COLUMNS}
+        meta_values = {name: df[c].tolist() for c, name in meta_cols.items()}
+
+        for i, text in enumerate(texts):
+            if not text:
+                continue
+            yield {"text": text, "metadata": {name: values[i] for name, values in meta_values.items() if values[i] != ""}}
+
+
+def load_csv(path):
+    """Whole file as plain text, one row per line (columns joined with ' | ')."""
+    lines = []
+    for df in _read_chunks(path):
+        if len(df.columns):
+            lines.extend(_join_columns(df, list(df.columns)).tolist())
+    return "\n".join(lines)
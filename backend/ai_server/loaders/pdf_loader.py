@@ -1,8 +1,24 @@
+from concurrent.futures import ProcessPoolExecutor
+
 import pypdf
 
-def load_pdf(path):
+# Pages extracted per worker task when a PDF is split across processes
+PAGES_PER_TASK = 16
+
+def pdf_page_ranges(path, pages_per_task=PAGES_PER_TASK):
+    """Split a PDF into [start, stop) page ranges for parallel extraction."""
+    num_pages = len(pypdf.PdfReader(path).pages)
+    return [(start, min(start + pages_per_task, num_pages)) for start in range(0, num_pages, pages_per_task)]
+
+def load_pdf_pages(path, start, stop):
     reader = pypdf.PdfReader(path)
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text() + "\n"
-    return text
+    return "\n".join((reader.pages[i].extract_text() or "") for i in range(start, stop))
+
+def load_pdf(path, max_workers=None):
+    ranges = pdf_page_ranges(path)
+    if len(ranges) <= 1 or max_workers == 1:
+        parts = [load_pdf_pages(path, start, stop) for start, stop in ranges]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            parts = list(pool.map(load_pdf_pages, [path] * len(ranges), *zip(*ranges)))
+    return "\n".join(parts) + "\n"
@@ -1,13 +1,31 @@
+import time
+
+_import_started = time.perf_counter()
+
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from rag.rag_pipeline import get_answer
-from fastapi.responses import JSONResponse
+from rag.rag_pipeline import get_answer_async, stream_answer_async
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 import requests
 import re
 import os
 import json
-from rag.gemini_client import ask_gemini
+import logging
+from rag.llm_cache import ask_gemini_cached
+from rag.gemini_scheduler import BACKGROUND, is_quota_error
+from vector_db.faiss_client import get_vector_store
+from utils import metrics, profiling, warmup
+from rag import embedder, gemini_client
+from config import BATCH_MAX_ITEMS, SCORE_BATCH_SIZE, MOOD_SCORE_THRESHOLD, LOG_LEVEL
+from mood.classifier import classify_many, get_classifier
+from mood.lexicon import ADVICE, score_many as lexicon_moods
+from assessments.generator import THEMES, AssessmentError, generate
+from assessments.pool import get_pool
 import random
+import asyncio
+
+logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="NeuroWell Vector Indexer")
 
@@ -20,32 +38,235 @@ app.add_middleware(
 )
 
 
+def _warm_vector_store():
+    # Load the FAISS shards once (later seeds are hot-reloaded) and run one search
+    get_vector_store().refresh(force=True).search(embedder.embed("warmup"), 1)
+
+
+def _warm_mood_classifier():
+    if get_classifier() is not None:
+        classify_many(["warmup"])
+
+
+WARMUP_PHASES = [
+    ("embedding_model", embedder.warmup),
+    ("vector_store", _warm_vector_store),
+    ("mood_classifier", _warm_mood_classifier),
+    ("gemini_client", gemini_client.warmup),
+]
+
+
+class RequestTimer:
+    """Pure ASGI middleware: http_request_seconds until the last body chunk is sent.
+
+    Streaming responses (/chat/stream) are timed to the end of the stream, not
+    to the headers, and nothing wraps the response objects.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        state = {"status": 500, "observed": False}
+
+        def observe():
+            state["observed"] = True
+            # Route template, not the raw path, so ids in URLs don't create new series
+            metrics.observe("http_request_seconds", time.perf_counter() - started, tags={
+                "path": _route_path(scope),
+                "method": scope["method"],
+                "status": state["status"],
+            })
+
+        async def timed_send(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                observe()
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            # Failed, or the client went away mid-stream
+            if not state["observed"]:
+                observe()
+
+
+app.add_middleware(RequestTimer)
+
+
+def _route_path(scope) -> str:
+    return getattr(scope.get("route"), "path", "unmatched")
+
+
+async def profile_requests(request: Request, call_next):
+    """Profile the selected requests (see utils/profiling.py) until their body is sent."""
+    profile = profiling.RequestProfile().start() if profiling.should_profile(request.headers) else None
+    if profile is None:
+        return await call_next(request)
+
+    try:
+        response = await call_next(request)
+    except Exception:
+        profile.finish(tags={"path": _route_path(request.scope)})
+        raise
+
+    body = response.body_iterator
+
+    async def profiled_body():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            profile.finish(tags={"path": _route_path(request.scope)})
+
+    # Streaming answers keep running after the headers go out
+    response.body_iterator = profiled_body()
+    response.headers[profiling.RESPONSE_HEADER] = profile.id
+    return response
+
+
+# Not installed at all unless PROFILE_TOKEN or PROFILE_SAMPLE_RATE is set
+if profiling.enabled():
+    app.middleware("http")(profile_requests)
+
+
+@app.on_event("startup")
+def start_warmup():
+    # Heavy loads run in the background so /healthz answers at once; /readyz waits for them
+    warmup.record("imports", time.perf_counter() - _import_started)
+    warmup.start(WARMUP_PHASES)
+    pool = get_pool()
+    if pool is not None:
+        pool.start(_pool_assessment)
+
+
+@app.on_event("shutdown")
+def stop_assessment_pool():
+    pool = get_pool()
+    if pool is not None:
+        pool.stop()
+
+
+@app.get("/healthz")
+def healthz():
+    return {"status": "ok", "uptime_s": round(warmup.uptime(), 3)}
+
+
+@app.get("/readyz")
+def readyz():
+    state = warmup.status()
+    return JSONResponse(state, status_code=200 if state["ready"] else 503)
+
+
+def _chat_query(data: dict) -> str:
+    return data.get("query", "") or data.get("question", "") or data.get("message", "")
+
+
 @app.post("/chat")
-def chat(data: dict):
-    user_query = data.get("query", "") or data.get("question", "") or data.get("message", "")
-    print("User query:", user_query)
-    print("Type of user query:", type(user_query))
-    print("User query repr:", data)
-    answer = get_answer(user_query)
+async def chat(data: dict, request: Request):
+    # Clients that accept server-sent events get the streaming variant
+    if "text/event-stream" in request.headers.get("accept", ""):
+        return await chat_stream(data)
+
+    user_query = _chat_query(data)
+    logger.debug("Chat request: %r", data)
+    answer = await get_answer_async(user_query)
 
     # If the answer is an error dictionary
     if isinstance(answer, dict) and "error" in answer:
+        if answer["error"] == "RATE_LIMIT":
+            metrics.increment("rate_limit_responses_total", tags={"endpoint": "chat"})
         return JSONResponse(
             status_code=429 if answer["error"] == "RATE_LIMIT" else 400,
             content=answer
         )
-    print("Answer:", answer)
+    logger.debug("Chat answer: %r", answer)
 
     return {"answer": answer}
 
 
-def predict_mood(text: str):
-    if "happy" in text.lower():
-        return "Happy", 90, "Keep smiling!"
-    elif "sad" in text.lower():
-        return "Sad", 85, "Talk to someone you trust."
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/chat/stream")
+async def chat_stream(data: dict):
+    """Stream the /chat answer as server-sent events.
+
+    Events: `token` {"text": ...} per Gemini chunk, then `done` {"sources": [...]},
+    or `error` {"error": ...} if the LLM call fails.
+    """
+    user_query = _chat_query(data)
+
+    async def events():
+        async for kind, payload in stream_answer_async(user_query):
+            if kind == "chunk":
+                yield _sse("token", {"text": payload})
+            elif kind == "sources":
+                yield _sse("done", {"sources": payload})
+            else:
+                yield _sse("error", {"error": payload})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/metrics")
+def get_metrics(format: str = "prometheus"):
+    """Prometheus text exposition; `?format=json` returns the same data as JSON."""
+    if format == "json":
+        return metrics.get_metrics()
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+def predict_moods(texts: list) -> list:
+    """/predict results for many texts: the trained classifier (one batched
+    embedding call) when `train_mood.py` has been run, else the shared lexicon."""
+    if get_classifier() is not None:
+        results = classify_many(texts)
     else:
-        return "Neutral", 70, "Maintain a positive mindset."
+        results = lexicon_moods(texts)
+    return [{"mood": r["mood"], "confidence": r["confidence"], "advice": ADVICE[r["mood"]]} for r in results]
+
+
+def _local_scores(texts: list) -> list:
+    """/score results from the local classifier: (score, raw) where its calibrated
+    confidence reaches `MOOD_SCORE_THRESHOLD`, None where Gemini should decide."""
+    if MOOD_SCORE_THRESHOLD <= 0 or not texts or get_classifier() is None:
+        return [None] * len(texts)
+    results = []
+    for r in classify_many(texts):
+        if r["mood"] == "Neutral" or r["confidence"] < MOOD_SCORE_THRESHOLD:
+            results.append(None)
+            continue
+        # Same 0-10 scale as Gemini's: low means negative
+        score = round(10 * (1 - r["probability"]), 2)
+        results.append((score, {
+            "mood": r["mood"], "confidence": score, "advice": ADVICE[r["mood"]],
+            "probability": r["probability"], "source": "local",
+        }))
+    local = sum(r is not None for r in results)
+    metrics.increment("score_local_total", local)
+    metrics.increment("score_gemini_fallback_total", len(results) - local)
+    return results
+
+
+def _batch_texts(payload) -> list:
+    """Texts of a batch request: {"texts": [...]} (or "entries"/"prompts"), order preserved."""
+    texts = payload.get("texts") or payload.get("entries") or payload.get("prompts")
+    if not isinstance(texts, list):
+        raise ValueError("texts (array of strings) required")
+    if len(texts) > BATCH_MAX_ITEMS:
+        raise ValueError(f"at most {BATCH_MAX_ITEMS} texts per request")
+    return ["" if t is None else str(t) for t in texts]
 
 
 @app.post("/predict")
@@ -55,25 +276,58 @@ async def predict(request: Request):
     if not text:
         return JSONResponse({"error": "Text is required"}, status_code=400)
 
-    mood, confidence, advice = predict_mood(text)
-    return {"mood": mood, "confidence": confidence, "advice": advice}
+    return (await asyncio.to_thread(predict_moods, [text]))[0]
 
 
-def _call_gemini_and_extract(text: str):
+@app.post("/predict/batch")
+async def predict_batch(request: Request):
+    """{"texts": [...]} -> {"results": [{"mood", "confidence", "advice"} | {"error"}, ...]} in input order."""
+    try:
+        texts = _batch_texts(await request.json())
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    todo = [i for i, t in enumerate(texts) if t]
+    predicted = await asyncio.to_thread(predict_moods, [texts[i] for i in todo])
+    results = [{"error": "Text is required"} for _ in texts]
+    for i, result in zip(todo, predicted):
+        results[i] = result
+    return {"results": results}
+
+
+SCORE_RULES = (
+    "Rules:\n"
+    "1. mood must be exactly one of: Happy, Sad, Neutral.\n"
+    "2. If the text expresses sadness, anger, frustration, stress, fear, or negativity, "
+    "confidence MUST be low (0–3).\n"
+    "3. If the text is neutral or factual with no emotion, confidence should be mid (4–6).\n"
+    "4. Only clearly positive, optimistic, or confident text may receive high confidence (7–10).\n"
+    "5. confidence must be an integer between 0 and 10.\n"
+    "6. advice must be practical, empathetic, and specific to the mood and situation. "
+    "Avoid generic advice like 'stay positive'.\n\n"
+)
+
+
+def _normalize_confidence(confidence):
+    """Gemini confidence (0-10, or 0-1) as a rounded number, or None."""
+    try:
+        if confidence is not None:
+            confidence = float(confidence)
+            if 0 <= confidence <= 1:
+                confidence = confidence * 100
+            confidence = round(confidence, 2)
+    except Exception:
+        confidence = None
+    return confidence
+
+
+async def _call_gemini_and_extract(text: str):
     # Build prompt expected by our gemini client/helper
     prompt = (
         "Analyze the text below and return ONLY a valid JSON object. "
         "Do NOT include explanations, markdown, or extra text.\n\n"
 
-        "Rules:\n"
-        "1. mood must be exactly one of: Happy, Sad, Neutral.\n"
-        "2. If the text expresses sadness, anger, frustration, stress, fear, or negativity, "
-        "confidence MUST be low (0–3).\n"
-        "3. If the text is neutral or factual with no emotion, confidence should be mid (4–6).\n"
-        "4. Only clearly positive, optimistic, or confident text may receive high confidence (7–10).\n"
-        "5. confidence must be an integer between 0 and 10.\n"
-        "6. advice must be practical, empathetic, and specific to the mood and situation. "
-        "Avoid generic advice like 'stay positive'.\n\n"
+        + SCORE_RULES +
 
         "Output JSON format:\n"
         '{ "mood": "Happy|Sad|Neutral", "confidence": 0-10, "advice": "string" }\n\n'
@@ -85,9 +339,7 @@ def _call_gemini_and_extract(text: str):
     parsed = None
     try:
         # ask_gemini returns a plain string response
-        GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-        print(GEMINI_API_KEY)
-        raw_response_text = ask_gemini(prompt)
+        raw_response_text = await ask_gemini_cached(prompt, priority=BACKGROUND)
     except Exception as e:
         # If library call fails, try the HTTP GEMINI_URL fallback
         GEMINI_URL = os.environ.get('GEMINI_URL')
@@ -96,7 +348,7 @@ def _call_gemini_and_extract(text: str):
             headers = {"Content-Type": "application/json"}
             if GEMINI_API_KEY:
                 headers["Authorization"] = f"Bearer {GEMINI_API_KEY}"
-            resp = requests.post(GEMINI_URL, json={"prompt": prompt}, headers=headers, timeout=15)
+            resp = await asyncio.to_thread(requests.post, GEMINI_URL, json={"prompt": prompt}, headers=headers, timeout=15)
             try:
                 parsed = resp.json()
             except Exception:
@@ -115,20 +367,21 @@ def _call_gemini_and_extract(text: str):
         candidates.append(raw_response_text)
 
     found = None
-    for c in candidates:
-        if c is None:
-            continue
-        if isinstance(c, dict):
-            found = c
-            break
-        s = c if isinstance(c, str) else json.dumps(c)
-        m = re.search(r"\{[\s\S]*\}", s)
-        if m:
-            try:
-                found = json.loads(m.group(0))
-                break
-            except Exception:
+    with metrics.timer("json_extract_seconds", tags={"endpoint": "score"}):
+        for c in candidates:
+            if c is None:
                 continue
+            if isinstance(c, dict):
+                found = c
+                break
+            s = c if isinstance(c, str) else json.dumps(c)
+            m = re.search(r"\{[\s\S]*\}", s)
+            if m:
+                try:
+                    found = json.loads(m.group(0))
+                    break
+                except Exception:
+                    continue
 
     confidence = None
     if isinstance(found, dict) and 'confidence' in found:
@@ -136,16 +389,76 @@ def _call_gemini_and_extract(text: str):
     elif isinstance(parsed, dict) and 'confidence' in parsed:
         confidence = parsed.get('confidence')
 
-    try:
-        if confidence is not None:
-            confidence = float(confidence)
-            if 0 <= confidence <= 1:
-                confidence = confidence * 100
-            confidence = round(confidence, 2)
-    except Exception:
-        confidence = None
+    return _normalize_confidence(confidence), found or parsed or raw_response_text
+
 
-    return confidence, found or parsed or raw_response_text
+async def _score_chunk(texts: list) -> list:
+    """Score several texts with one Gemini call; returns [{"score", "raw"} | {"error"}] in order.
+
+    Entries a parsed reply leaves out are scored one by one. A failed or
+    unparsable call is retried once as a whole (not after quota errors), then
+    every entry gets the error.
+    """
+    entries = "\n".join(f"Entry {i + 1}: {json.dumps(t, ensure_ascii=False)}" for i, t in enumerate(texts))
+    prompt = (
+        f"Analyze each of the {len(texts)} journal entries below and return ONLY a valid JSON array "
+        "with one object per entry, in the same order. "
+        "Do NOT include explanations, markdown, or extra text.\n\n"
+
+        + SCORE_RULES +
+
+        "Output JSON format:\n"
+        '[ { "entry": 1, "mood": "Happy|Sad|Neutral", "confidence": 0-10, "advice": "string" }, ... ]\n\n'
+
+        f"{entries}"
+    )
+
+    items, error = None, None
+    for attempt in range(2):
+        try:
+            # The retry skips the response cache, which may hold the unparsable reply
+            ask = ask_gemini_cached if attempt == 0 else gemini_client.ask_gemini_async
+            raw = await ask(prompt, priority=BACKGROUND)
+            with metrics.timer("json_extract_seconds", tags={"endpoint": "score_batch"}):
+                m = re.search(r"\[[\s\S]*\]", raw or "")
+                items = json.loads(m.group(0)) if m else None
+            if isinstance(items, list):
+                break
+            items, error = None, "Unable to parse JSON array from Gemini response"
+        except Exception as e:
+            error = f"Batch scoring failed: {e}"
+            # The scheduler already retried quota errors on every key
+            if is_quota_error(e) or (e.__cause__ is not None and is_quota_error(e.__cause__)):
+                break
+        logger.warning("⚠️ Batch scoring attempt %d failed: %s", attempt + 1, error)
+
+    metrics.increment("score_batch_calls_total")
+    if items is None:
+        # Never fan out to one call per entry here: that multiplies traffic when quota is short
+        metrics.increment("score_batch_failed_items_total", len(texts))
+        return [{"error": error} for _ in texts]
+
+    by_entry = {}
+    items = [item for item in items if isinstance(item, dict)]
+    for pos, item in enumerate(items):
+        try:
+            entry = int(item.get("entry", item.get("id")))
+        except (TypeError, ValueError):
+            # No usable entry number: trust the order if the count matches
+            entry = pos + 1 if len(items) == len(texts) else None
+        if entry is not None and 1 <= entry <= len(texts):
+            by_entry[entry - 1] = item
+
+    # Only entries the parsed reply left out are scored one by one
+    missing = [i for i in range(len(texts)) if i not in by_entry]
+    if missing:
+        metrics.increment("score_batch_fallback_items_total", len(missing))
+    singles = await asyncio.gather(*(_call_gemini_and_extract(texts[i]) for i in missing))
+
+    results = {i: {"score": score, "raw": raw} for i, (score, raw) in zip(missing, singles)}
+    for i, item in by_entry.items():
+        results[i] = {"score": _normalize_confidence(item.get("confidence")), "raw": item}
+    return [results[i] for i in range(len(texts))]
 
 
 @app.post('/score')
@@ -164,19 +477,64 @@ async def score_endpoint(request: Request):
         return JSONResponse({"error": "prompt (or text) required"}, status_code=400)
 
     try:
-        score, raw = _call_gemini_and_extract(str(prompt))
+        local = (await asyncio.to_thread(_local_scores, [str(prompt)]))[0]
+        if local is not None:
+            score, raw = local
+        else:
+            score, raw = await _call_gemini_and_extract(str(prompt))
     except Exception as e:
         return JSONResponse({"error": str(e)}, status_code=500)
 
     return {"score": score, "raw": raw}
 
 
+@app.post('/score/batch')
+async def score_batch_endpoint(request: Request):
+    """Score many texts: {"texts": [...]} -> {"results": [{"score", "raw"} | {"error"}, ...]} in input order.
+
+    Entries the local classifier is confident about are answered locally; the
+    rest are packed `SCORE_BATCH_SIZE` per Gemini call, and the calls run concurrently.
+    """
+    try:
+        texts = _batch_texts(await request.json())
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    results = [{"error": "prompt (or text) required"} for _ in texts]
+    todo = [i for i, t in enumerate(texts) if t.strip()]
+    metrics.increment("score_batch_items_total", len(todo))
+    try:
+        local = await asyncio.to_thread(_local_scores, [texts[i] for i in todo])
+        for i, result in zip(todo, local):
+            if result is not None:
+                results[i] = {"score": result[0], "raw": result[1]}
+        todo = [i for i, result in zip(todo, local) if result is None]
+
+        chunks = [todo[i:i + SCORE_BATCH_SIZE] for i in range(0, len(todo), SCORE_BATCH_SIZE)]
+        scored = await asyncio.gather(*(_score_chunk([texts[i] for i in chunk]) for chunk in chunks))
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+    for chunk, chunk_results in zip(chunks, scored):
+        for i, result in zip(chunk, chunk_results):
+            results[i] = result
+    return {"results": results}
+
+
+async def _pool_assessment(theme: str, num: int) -> dict:
+    # Fresh (uncached) exact-size quizzes, so the pool never serves the same one twice
+    return await generate(theme, num, cached=False, exact=True)
+
+
 @app.post('/assessment/generate')
 async def generate_assessment(request: Request):
     """Open endpoint: generate an assessment with questions via Gemini and return validated JSON.
 
     Request JSON: { "theme": "...", "numQuestions": 5 }
     Response JSON: { "assessment": { "title": "..." }, "questions": [ { "title": "...", "options": [...], "correctAnswer": "..." }, ... ], "raw": <ai raw> }
+
+    Without journal entries the assessment comes from the pre-generated pool
+    (assessments/pool.py) when one is ready; otherwise it is generated live.
     """
     try:
         payload = await request.json()
@@ -184,18 +542,6 @@ async def generate_assessment(request: Request):
         return JSONResponse({"error": "Invalid JSON"}, status_code=400)
 
     theme = payload.get('theme')
-    # pick a random theme if none provided
-    THEMES = [
-        'historical trivia',
-        'fun facts and puzzles',
-        'mindfulness and self-care',
-        'gratitude and reflection',
-        'healthy habits and routines',
-        'light games and challenges',
-        'creative prompts and storytelling'
-    ]
-    if not theme:
-        theme = random.choice(THEMES)
     try:
         num = int(payload.get('numQuestions') or payload.get('num') or 5)
     except Exception:
@@ -210,95 +556,18 @@ async def generate_assessment(request: Request):
     else:
         journal_data = str(journal_data)
 
-    prompt = (
-        "Return ONLY valid JSON. Do not include explanations, markdown, or extra text.\n\n"
-
-        "You are creating a short, fun, and interactive self-assessment based on a user's recent journal entries.\n\n"
-
-        "Input context:\n"
-        "- Journal entries may include thoughts, emotions, activities, struggles, wins, or reflections from the last 2 days.\n"
-        "- If journal entries are provided and contain meaningful content, tailor the assessment questions directly to those themes.\n"
-        "- If journal entries are missing, empty, or meaningless, generate a general but fun self-assessment suitable for anyone.\n\n"
-
-        "Tone and style rules:\n"
-        "- Keep the tone friendly, light, and engaging.\n"
-        "- Questions should feel like a game or reflection quiz, not an exam.\n"
-        "- Avoid clinical or judgmental language.\n"
-        "- Make options relatable, human, and easy to choose from.\n\n"
-
-        "JSON structure rules:\n"
-        "- Return one object with keys:\n"
-        "  - title (string)\n"
-        "  - questions (array)\n"
-        "- Each question must be an object with:\n"
-        "  - title (string)\n"
-        "  - options (array of exactly 4 strings)\n"
-        "  - correctAnswer (must exactly match one option)\n"
-        "- Generate exactly {num} questions.\n\n"
-
-        "Content rules:\n"
-        "- Questions should gently reinforce self-awareness, mood, habits, or mindset.\n"
-        "- Correct answers should reflect the healthiest, most constructive, or most self-aware choice — but never shame the user.\n\n"
-
-        f"Theme: {theme}\n"
-        f"Journal entries (last 2 days): {journal_data}\n\n"
-
-        "Return ONLY the JSON object."
-    )
+    pool = get_pool()
+    slot = pool.slot(theme, num) if pool is not None and not journal_data.strip() else None
+    if slot is not None:
+        assessment = await pool.take(slot)
+        if assessment is not None:
+            return assessment
+        theme = theme or slot[0]
 
-    raw = None
-    parsed = None
+    # pick a random theme if none provided
+    if not theme:
+        theme = random.choice(THEMES)
     try:
-        raw = ask_gemini(prompt)
-    except Exception as e:
-        GEMINI_URL = os.environ.get('GEMINI_URL')
-        GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
-        if not GEMINI_URL:
-            return JSONResponse({"error": "Gemini client failed", "details": str(e)}, status_code=502)
-        headers = {"Content-Type": "application/json"}
-        if GEMINI_API_KEY:
-            headers["Authorization"] = f"Bearer {GEMINI_API_KEY}"
-        try:
-            resp = requests.post(GEMINI_URL, json={"prompt": prompt}, headers=headers, timeout=20)
-            try:
-                parsed = resp.json()
-            except Exception:
-                raw = resp.text
-        except Exception as e2:
-            return JSONResponse({"error": "Gemini request failed", "details": str(e2)}, status_code=502)
-
-    # If parsed not set, try to extract JSON from raw text
-    if parsed is None and raw:
-        m = re.search(r"\{[\s\S]*\}", raw)
-        if m:
-            try:
-                parsed = json.loads(m.group(0))
-            except Exception:
-                parsed = None
-
-    if parsed is None:
-        return JSONResponse({"error": "Unable to parse JSON from Gemini response", "raw": raw}, status_code=502)
-
-    # locate title and questions
-    title = parsed.get('title') or (parsed.get('assessment') and isinstance(parsed.get('assessment'), dict) and parsed.get('assessment').get('title'))
-    questions = parsed.get('questions')
-    if not title or not isinstance(questions, list):
-        return JSONResponse({"error": "AI returned invalid assessment structure", "raw": parsed}, status_code=502)
-
-    valid_questions = []
-    for q in questions:
-        if not isinstance(q, dict):
-            continue
-        qtitle = q.get('title') or q.get('question')
-        options = q.get('options')
-        correct = q.get('correctAnswer') or q.get('correct') or q.get('answer')
-        if not qtitle or not isinstance(options, list) or len(options) != 4:
-            continue
-        if not correct or correct not in options:
-            continue
-        valid_questions.append({"title": qtitle, "options": options, "correctAnswer": correct})
-
-    if len(valid_questions) == 0:
-        return JSONResponse({"error": "No valid questions produced by AI", "raw": parsed}, status_code=502)
-
-    return {"assessment": {"title": title}, "questions": valid_questions, "raw": parsed}
+        return await generate(theme, num, journal_data)
+    except AssessmentError as e:
+        return JSONResponse(e.body, status_code=502)
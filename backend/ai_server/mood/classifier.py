@@ -0,0 +1,135 @@
+"""
+Local mood classifier: a logistic-regression head over the shared MiniLM
+embeddings, trained on the labeled CSVs in `DOCS_DIR` (label 1 = distress).
+
+The head is fit with Newton's method (no scikit-learn needed) and its
+probabilities are Platt-calibrated on a held-out split, so `confidence` can be
+compared against a threshold. `python train_mood.py` writes the artifact
+(`MOOD_MODEL_PATH`, a few KB of plain numpy arrays, no pickle); the server
+loads it lazily and falls back to keyword rules while it does not exist.
+
+Provides:
+- classify_many(texts)  -> [{"mood", "confidence", "probability"}], one embed_batch call
+- classify(text)
+- get_classifier()      -> the loaded MoodClassifier, or None without an artifact
+"""
+
+import json
+import logging
+import os
+import threading
+from typing import List, Optional
+
+import numpy as np
+
+from config import MOOD_MODEL_PATH
+from rag.embedder import embed_batch
+
+MOODS = ("Happy", "Sad")
+# Below this calibrated confidence (percent) the text is reported as Neutral
+NEUTRAL_BELOW = 60
+
+logger = logging.getLogger(__name__)
+
+
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    return 0.5 * (1 + np.tanh(0.5 * z))
+
+
+def fit_logistic(X: np.ndarray, y: np.ndarray, l2: float = 1.0, max_iter: int = 25, tol: float = 1e-6):
+    """L2-regularized logistic regression by Newton/IRLS. Returns (weights, bias)."""
+    n, d = X.shape
+    Xb = np.hstack([X, np.ones((n, 1), dtype=X.dtype)]).astype("float64")
+    w = np.zeros(d + 1)
+    reg = np.full(d + 1, l2)
+    reg[-1] = 0.0  # bias is not regularized
+    for _ in range(max_iter):
+        p = _sigmoid(Xb @ w)
+        grad = Xb.T @ (p - y) + reg * w
+        hess = (Xb * (p * (1 - p))[:, None]).T @ Xb + np.diag(reg)
+        step = np.linalg.solve(hess, grad)
+        w -= step
+        if np.abs(step).max() < tol:
+            break
+    return w[:-1], float(w[-1])
+
+
+def fit_platt(logits: np.ndarray, y: np.ndarray):
+    """Platt scaling p = sigmoid(a * logit + b) on held-out logits. Returns (a, b)."""
+    (a,), b = fit_logistic(logits.reshape(-1, 1), y, l2=1e-6)
+    return float(a), b
+
+
+class MoodClassifier:
+    def __init__(self, weights: np.ndarray, bias: float, platt=(1.0, 0.0), meta: Optional[dict] = None):
+        self.weights = np.asarray(weights, dtype="float32")
+        self.bias = float(bias)
+        self.platt = tuple(float(v) for v in platt)
+        self.meta = meta or {}
+
+    def logits(self, embeddings: np.ndarray) -> np.ndarray:
+        return embeddings @ self.weights + self.bias
+
+    def predict_proba(self, embeddings: np.ndarray) -> np.ndarray:
+        """Calibrated probability of distress (label 1) per embedding row."""
+        a, b = self.platt
+        return _sigmoid(a * self.logits(embeddings).astype("float64") + b)
+
+    def save(self, path: str = MOOD_MODEL_PATH):
+        from vector_db.faiss_client import atomic_replace
+
+        def write(tmp):
+            with open(tmp, "wb") as f:
+                np.savez(f, weights=self.weights, bias=np.float32(self.bias), platt=np.asarray(self.platt),
+                         meta=np.asarray(json.dumps(self.meta)))
+        atomic_replace(path, write)
+
+    @classmethod
+    def load(cls, path: str = MOOD_MODEL_PATH) -> "MoodClassifier":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["weights"], float(data["bias"]), tuple(data["platt"]), json.loads(str(data["meta"])))
+
+
+_classifier: Optional[MoodClassifier] = None
+_classifier_mtime: Optional[int] = None
+_classifier_lock = threading.Lock()
+
+
+def get_classifier() -> Optional[MoodClassifier]:
+    """The trained classifier, reloaded when the artifact changes; None if not trained yet."""
+    global _classifier, _classifier_mtime
+    try:
+        mtime = os.stat(MOOD_MODEL_PATH).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if mtime != _classifier_mtime:
+        with _classifier_lock:
+            if mtime != _classifier_mtime:
+                _classifier = MoodClassifier.load(MOOD_MODEL_PATH)
+                _classifier_mtime = mtime
+                logger.info("🧠 Mood classifier loaded (%s).", MOOD_MODEL_PATH)
+    return _classifier
+
+
+def _result(p: float) -> dict:
+    confidence = round(100 * max(p, 1 - p), 1)
+    mood = MOODS[int(p >= 0.5)] if confidence >= NEUTRAL_BELOW else "Neutral"
+    return {"mood": mood, "confidence": confidence, "probability": round(float(p), 4)}
+
+
+def classify_many(texts: List[str], classifier: Optional[MoodClassifier] = None) -> List[dict]:
+    """Classify texts with one batched embedding call. Requires a trained classifier.
+
+    `probability` is the calibrated probability of distress; `confidence` is
+    the calibrated probability (percent) of the reported Happy/Sad side.
+    """
+    classifier = classifier or get_classifier()
+    if classifier is None:
+        raise RuntimeError("Mood classifier not trained; run `python train_mood.py`")
+    if not texts:
+        return []
+    return [_result(p) for p in classifier.predict_proba(embed_batch(list(texts)))]
+
+
+def classify(text: str) -> dict:
+    return classify_many([text])[0]
@@ -0,0 +1,11 @@
+from .classifier import classify, classify_many, get_classifier
+from .lexicon import ADVICE, score, score_many
+
+__all__ = [
+    "classify",
+    "classify_many",
+    "get_classifier",
+    "ADVICE",
+    "score",
+    "score_many"
+]
@@ -0,0 +1,128 @@
+"""
+Lexicon mood engine shared by `backend/model.py` and `/predict`.
+
+A weighted word/phrase dictionary per mood is compiled once into a single
+word-boundary regex, so a text is scanned in one pass no matter how many
+terms there are ("sad" never matches inside "crusade"). A negator ("not",
+"never", "don't", ...) flips the next few words until punctuation or "but":
+"not happy" counts towards Sad, "not sad" towards Happy at half weight, and a
+negated term with no opposite ("not angry") is ignored.
+
+Standard library only, so the CLI can import it without the server's
+dependencies.
+
+Provides:
+- score_many(texts) -> [{"mood", "confidence", "advice", "scores"}]
+- score(text)
+- ADVICE            -> advice text per mood
+"""
+
+import re
+from typing import Dict, List, Tuple
+
+LEXICON: Dict[str, Dict[str, float]] = {
+    "Sad": {
+        "sad": 1.0, "depressed": 1.5, "depression": 1.5, "down": 0.5, "feeling down": 1.0,
+        "tired": 0.5, "exhausted": 0.75, "worn out": 0.75, "lonely": 1.0, "alone": 0.5,
+        "hopeless": 1.5, "miserable": 1.25, "unhappy": 1.0, "crying": 1.0, "cry": 0.75,
+        "heartbroken": 1.5, "empty": 0.75, "worthless": 1.5, "grief": 1.0, "grieving": 1.0,
+        "upset": 0.75,
+    },
+    "Happy": {
+        "happy": 1.0, "excited": 1.0, "joy": 1.0, "joyful": 1.0, "great": 0.5, "glad": 1.0,
+        "grateful": 1.0, "thankful": 1.0, "cheerful": 1.0, "content": 0.5, "delighted": 1.25,
+        "love": 0.5, "awesome": 0.75, "amazing": 0.75, "wonderful": 1.0, "proud": 0.75,
+        "relaxed": 0.75, "calm": 0.5, "over the moon": 1.5,
+    },
+    "Angry": {
+        "angry": 1.25, "frustrated": 1.0, "irritated": 1.0, "annoyed": 0.75, "furious": 1.5,
+        "mad": 0.75, "rage": 1.25, "hate": 1.0, "resentful": 1.0, "fed up": 1.0, "pissed": 1.0,
+    },
+    "Anxious": {
+        "anxious": 1.25, "anxiety": 1.25, "scared": 1.0, "nervous": 1.0, "worried": 1.0,
+        "worry": 0.75, "afraid": 1.0, "fear": 1.0, "panic": 1.5, "panic attack": 2.0,
+        "stressed": 1.0, "stress": 0.75, "overwhelmed": 1.0, "restless": 0.75, "tense": 0.75,
+        "on edge": 1.0,
+    },
+}
+
+ADVICE = {
+    "Sad": "Talk to someone you trust, take rest and avoid isolation.",
+    "Happy": "Keep enjoying your positive moments!",
+    "Angry": "Try breathing exercises and take a break.",
+    "Anxious": "Practice grounding techniques and slow breathing.",
+    "Neutral": "Maintain balance and stay consistent.",
+}
+
+# Where a negated term's weight goes, and how much of it
+NEGATED = {"Happy": "Sad", "Sad": "Happy"}
+NEGATED_WEIGHT = 0.5
+# Words after a negator that it still applies to
+NEGATION_SCOPE = 3
+NEGATORS = ("not", "no", "never", "nothing", "nobody", "hardly", "without", "cannot")
+
+NEUTRAL_CONFIDENCE = 70
+
+
+def _compile() -> Tuple["re.Pattern", Dict[str, Tuple[str, float]]]:
+    terms = {term: (mood, weight) for mood, words in LEXICON.items() for term, weight in words.items()}
+    # Longest first so "panic attack" wins over "panic"; phrases match any run of whitespace
+    alternatives = "|".join(
+        r"\s+".join(map(re.escape, term.split())) for term in sorted(terms, key=len, reverse=True)
+    )
+    pattern = re.compile(
+        rf"(?P<neg>\b(?:{'|'.join(NEGATORS)})\b|\b\w+n't\b)"
+        r"|(?P<stop>[.!?;,]|\bbut\b)"
+        rf"|\b(?P<term>{alternatives})\b"
+    )
+    return pattern, terms
+
+
+_PATTERN, _TERMS = _compile()
+_WORD = re.compile(r"\w+")
+
+
+def _scores(text: str) -> Dict[str, float]:
+    text = text.lower().replace("’", "'")
+    scores = dict.fromkeys(LEXICON, 0.0)
+    negated_at = None
+    for match in _PATTERN.finditer(text):
+        kind = match.lastgroup
+        if kind == "neg":
+            negated_at = match.end()
+        elif kind == "stop":
+            negated_at = None
+        else:
+            mood, weight = _TERMS[" ".join(match.group().split())]
+            if negated_at is not None and len(_WORD.findall(text, negated_at, match.start())) < NEGATION_SCOPE:
+                if mood not in NEGATED:
+                    continue
+                mood, weight = NEGATED[mood], weight * NEGATED_WEIGHT
+            scores[mood] += weight
+    return scores
+
+
+def _result(scores: Dict[str, float]) -> dict:
+    # Ties go to the mood listed first in LEXICON
+    mood = max(scores, key=scores.get)
+    top, total = scores[mood], sum(scores.values())
+    if top <= 0:
+        mood, confidence = "Neutral", NEUTRAL_CONFIDENCE
+    else:
+        # 75 for one clear hit, up to 95 as evidence piles up; mixed signals lower it
+        confidence = round(min(95.0, 55 + 40 * (top / total) * min(top, 2.0) / 2))
+    return {
+        "mood": mood,
+        "confidence": confidence,
+        "advice": ADVICE[mood],
+        "scores": {m: round(s, 2) for m, s in scores.items() if s},
+    }
+
+
+def score_many(texts: List[str]) -> List[dict]:
+    """Score each text; one regex pass per text, in input order."""
+    return [_result(_scores(text or "")) for text in texts]
+
+
+def score(text: str) -> dict:
+    return score_many([text])[0]
@@ -0,0 +1,97 @@
+"""
+Context packer for RAG prompts.
+
+Picks which retrieved chunks go into the prompt, best evidence first:
+- Relevance comes from the FAISS distance (MiniLM vectors are unit length, so
+  squared L2 distance d is cosine similarity 1 - d/2).
+- Chunks are chosen greedily by MMR: relevance minus similarity to the chunks
+  already kept, weighted by `RAG_MMR_LAMBDA`, using the stored vectors.
+- A candidate at cosine similarity >= `RAG_DUPLICATE_SIMILARITY` to a kept
+  chunk is dropped as a near-duplicate (retweets, copy-pasted posts).
+- Chunks are added until `RAG_TOP_K` are kept or the next one would overflow
+  `RAG_CONTEXT_TOKENS`. Tokens are counted with the embedding model's
+  tokenizer, which is already loaded. Gemini's own count is a network call.
+
+Provides:
+- pack_context(hits)   -> the kept hits, in pick order
+- format_hit(hit)      -> one context entry as it appears in the prompt
+- count_tokens(texts)
+"""
+
+from typing import List
+
+import numpy as np
+
+from config import RAG_CONTEXT_TOKENS, RAG_DUPLICATE_SIMILARITY, RAG_MMR_LAMBDA, RAG_TOP_K
+from rag.embedder import embed_batch, get_tokenizer
+from utils import metrics
+
+CONTEXT_SEPARATOR = "\n\n"
+TOKEN_BUCKETS = (32, 64, 128, 256, 512, 1024, 2048, 4096)
+
+
+def format_hit(hit: dict) -> str:
+    return f"[source: {hit['source']}] {hit['text']}"
+
+
+def count_tokens(texts: List[str]) -> List[int]:
+    if not texts:
+        return []
+    ids = get_tokenizer()(texts, add_special_tokens=False, verbose=False)["input_ids"]
+    return [len(row) for row in ids]
+
+
+def _unit_vectors(hits: List[dict]) -> np.ndarray:
+    """Stored vectors of the hits, L2-normalized; re-embeds the ones the index could not return."""
+    missing = [h["text"] for h in hits if h.get("vector") is None]
+    embedded = iter(embed_batch(missing)) if missing else None
+    vectors = np.stack([
+        next(embedded) if h.get("vector") is None else h["vector"] for h in hits
+    ]).astype("float32")
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def pack_context(hits: List[dict], max_chunks: int = RAG_TOP_K, budget: int = RAG_CONTEXT_TOKENS,
+                 mmr_lambda: float = RAG_MMR_LAMBDA,
+                 duplicate_similarity: float = RAG_DUPLICATE_SIMILARITY) -> List[dict]:
+    """Choose up to `max_chunks` of `hits` ({source, text, distance, vector}) within `budget` tokens."""
+    if not hits or max_chunks <= 0:
+        return []
+    with metrics.timer("context_pack_seconds"):
+        relevance = 1 - np.array([h["distance"] for h in hits], dtype="float32") / 2
+        vectors = _unit_vectors(hits)
+        tokens = count_tokens([format_hit(h) for h in hits])
+        separator = count_tokens([CONTEXT_SEPARATOR])[0]
+
+        # Highest similarity of each candidate to any chunk kept so far
+        redundancy = np.full(len(hits), -1.0, dtype="float32")
+        candidates = np.ones(len(hits), dtype=bool)
+        kept: List[int] = []
+        used = 0
+        dropped = {"duplicate": 0, "budget": 0}
+
+        while candidates.any() and len(kept) < max_chunks:
+            duplicates = candidates & (redundancy >= duplicate_similarity)
+            dropped["duplicate"] += int(duplicates.sum())
+            candidates &= ~duplicates
+            if not candidates.any():
+                break
+            score = mmr_lambda * relevance - (1 - mmr_lambda) * np.maximum(redundancy, 0)
+            best = int(np.argmax(np.where(candidates, score, -np.inf)))
+            candidates[best] = False
+            cost = tokens[best] + (separator if kept else 0)
+            if used + cost > budget:
+                # Too long for what is left; a shorter candidate may still fit
+                dropped["budget"] += 1
+                continue
+            kept.append(best)
+            used += cost
+            redundancy = np.maximum(redundancy, vectors @ vectors[best])
+
+    for reason, count in dropped.items():
+        if count:
+            metrics.increment("context_chunks_dropped_total", count, tags={"reason": reason})
+    metrics.observe("context_tokens", used, buckets=TOKEN_BUCKETS)
+    return [hits[i] for i in kept]
+
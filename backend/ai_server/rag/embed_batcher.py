@@ -0,0 +1,100 @@
+"""
+Asyncio micro-batcher for query embeddings.
+
+Concurrent /chat requests each need one query vector. Encoding them one at a
+time wastes most of what the transformer can do on CPU, so queries arriving
+within `EMBED_BATCH_WAIT_MS` of each other (up to `EMBED_BATCH_MAX_SIZE`) are
+collected and encoded with a single `embed_batch` call. Each caller gets its
+own row back.
+
+The encode runs on a dedicated single-thread executor so it never blocks the
+event loop and batches never compete with each other for CPU.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Set, Tuple
+
+import numpy as np
+
+from config import EMBED_BATCH_WAIT_MS, EMBED_BATCH_MAX_SIZE
+from rag.embedder import embed_batch, normalize_text, cached_embedding, cache_embedding
+from utils import metrics
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+class EmbeddingBatcher:
+    def __init__(self, max_wait_ms: float = EMBED_BATCH_WAIT_MS, max_batch_size: int = EMBED_BATCH_MAX_SIZE):
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch_size = max(1, max_batch_size)
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # The loop only keeps weak references to tasks; hold running flushes until they finish
+        self._tasks: Set[asyncio.Task] = set()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed-batcher")
+
+    async def embed(self, text: str) -> np.ndarray:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((text, fut))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush("full")
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush, "timeout")
+        return await fut
+
+    def _flush(self, reason: str):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._run(batch, reason))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]], reason: str):
+        # Identical texts in one window are encoded once
+        texts = list(dict.fromkeys(text for text, _ in batch))
+
+        metrics.increment("embed_batches_total", tags={"reason": reason})
+        metrics.increment("embed_batch_items_total", len(batch))
+        metrics.observe("embed_batch_size", len(texts), buckets=BATCH_SIZE_BUCKETS)
+        metrics.observe("embed_batch_fill_ratio", len(texts) / self.max_batch_size,
+                        buckets=(0.1, 0.25, 0.5, 0.75, 1.0))
+
+        loop = asyncio.get_running_loop()
+        try:
+            vectors = await loop.run_in_executor(self._executor, embed_batch, texts)
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+
+        rows = dict(zip(texts, vectors))
+        for text, fut in batch:
+            if not fut.done():
+                fut.set_result(rows[text])
+
+
+_batcher: Optional[EmbeddingBatcher] = None
+
+
+def get_batcher() -> EmbeddingBatcher:
+    global _batcher
+    if _batcher is None:
+        _batcher = EmbeddingBatcher()
+    return _batcher
+
+
+async def embed_async(text: str) -> np.ndarray:
+    """Async counterpart of `rag.embedder.embed`: LRU cache first, then the batcher."""
+    key = normalize_text(text)
+    vec = cached_embedding(key)
+    if vec is not None:
+        return vec
+    vec = await get_batcher().embed(key)
+    cache_embedding(key, vec)
+    return vec
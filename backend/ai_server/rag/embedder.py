@@ -1,8 +1,124 @@
-from sentence_transformers import SentenceTransformer
-from config import EMBED_MODEL
+"""
+Shared embedding engine.
 
-model = SentenceTransformer(EMBED_MODEL)
+One SentenceTransformer instance serves the whole process. It is created on
+first use (or by an explicit `warmup()`), so importing this module is cheap.
 
-def embed(text: str):
-    """Embed a single query text into a vector."""
-    return model.encode([text], convert_to_numpy=True)[0]
+Provides:
+- embed(text)          -> float32 vector, LRU-cached on the normalized text
+- embed_batch(texts)   -> float32 matrix, uncached (documents, batches)
+- embedding_dimension()
+- get_tokenizer()        -> the model's tokenizer, without loading the weights
+- warmup()
+"""
+
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+
+from config import EMBED_MODEL, EMBED_BATCH_SIZE, EMBED_CACHE_SIZE
+from utils import metrics
+
+_model = None
+_tokenizer = None
+_model_lock = threading.Lock()
+
+_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0}
+
+
+def get_model():
+    """Return the process-wide SentenceTransformer, loading it on first call."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from sentence_transformers import SentenceTransformer
+                _model = SentenceTransformer(EMBED_MODEL)
+    return _model
+
+
+def get_tokenizer():
+    """The embedding model's tokenizer (for chunking); cheap to load in worker processes."""
+    global _tokenizer
+    if _tokenizer is None:
+        with _model_lock:
+            if _tokenizer is None:
+                if _model is not None:
+                    _tokenizer = _model.tokenizer
+                else:
+                    from transformers import AutoTokenizer
+                    _tokenizer = AutoTokenizer.from_pretrained(EMBED_MODEL)
+    return _tokenizer
+
+
+def embedding_dimension() -> int:
+    return get_model().get_sentence_embedding_dimension()
+
+
+def normalize_text(text: str) -> str:
+    # MiniLM's tokenizer lowercases, so case and spacing never change the vector
+    return " ".join((text or "").split()).lower()
+
+
+def embed_batch(texts: List[str], batch_size: Optional[int] = None, show_progress_bar: bool = False) -> np.ndarray:
+    """Embed many texts in one call. Returns a (len(texts), dim) float32 array."""
+    if not texts:
+        return np.zeros((0, embedding_dimension()), dtype="float32")
+    model = get_model()
+    with metrics.timer("embed_seconds"):
+        embeddings = model.encode(
+            list(texts),
+            batch_size=batch_size or EMBED_BATCH_SIZE,
+            convert_to_numpy=True,
+            show_progress_bar=show_progress_bar,
+        )
+    return np.asarray(embeddings, dtype="float32")
+
+
+def cached_embedding(key: str) -> Optional[np.ndarray]:
+    """Look up a normalized text in the query-embedding cache."""
+    with _cache_lock:
+        vec = _cache.get(key)
+        if vec is None:
+            _cache_stats["misses"] += 1
+        else:
+            _cache.move_to_end(key)
+            _cache_stats["hits"] += 1
+    metrics.increment("embed_cache_misses_total" if vec is None else "embed_cache_hits_total")
+    return vec
+
+
+def cache_embedding(key: str, vec: np.ndarray):
+    """Store a normalized text's embedding (made read-only) in the cache."""
+    vec.setflags(write=False)
+    if EMBED_CACHE_SIZE <= 0:
+        return
+    with _cache_lock:
+        _cache[key] = vec
+        _cache.move_to_end(key)
+        while len(_cache) > EMBED_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def embed(text: str) -> np.ndarray:
+    """Embed a single query text into a vector (cached, read-only)."""
+    key = normalize_text(text)
+    vec = cached_embedding(key)
+    if vec is None:
+        vec = embed_batch([key])[0]
+        cache_embedding(key, vec)
+    return vec
+
+
+def cache_info() -> dict:
+    with _cache_lock:
+        return {**_cache_stats, "size": len(_cache), "max_size": EMBED_CACHE_SIZE}
+
+
+def warmup():
+    """Load the model and run one encode so the first request pays nothing."""
+    embed_batch(["warmup"])
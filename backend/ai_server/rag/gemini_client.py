@@ -1,35 +1,190 @@
+import itertools
+import logging
 import os
-import google.generativeai as genai
-from google.api_core.exceptions import ResourceExhausted
-from google.api_core.exceptions import GoogleAPICallError
+import threading
+import time
+from typing import AsyncIterator, Optional
 
+from rag.gemini_scheduler import INTERACTIVE, KeyState, api_keys, get_scheduler
+from utils import metrics
+
+logger = logging.getLogger(__name__)
 
 # Read configuration from environment with sensible defaults
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+# Max Gemini calls in flight at once from the async API (per process)
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "256"))
+
+# One GenerativeModel per (model name, pool key); they hold the client/channel, so reuse them
+_models = {}
+_models_lock = threading.Lock()
+_genai = None
+
+
+def _get_genai():
+    """Import and configure the Gemini SDK on first use (it takes ~0.5s to import)."""
+    global _genai
+    if _genai is None:
+        with _models_lock:
+            if _genai is None:
+                import google.generativeai as genai
+                keys = api_keys()
+                if keys:
+                    genai.configure(api_key=keys[0])
+                _genai = genai
+    return _genai
+
+
+# SDK releases whose GenerativeModel creates its clients lazily in `_client` /
+# `_async_client` (checked against 0.7.x and 0.8.x)
+KEY_CLIENT_SDK_VERSIONS = ("0.7.", "0.8.")
+_warned_key_clients = False
+
 
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
-    print(GEMINI_API_KEY)
+def _key_clients_supported(genai, model) -> bool:
+    version = getattr(genai, "__version__", "")
+    return (version.startswith(KEY_CLIENT_SDK_VERSIONS)
+            and getattr(model, "_client", False) is None
+            and getattr(model, "_async_client", False) is None)
 
-def ask_gemini(prompt: str) -> str:
+
+def _new_model(genai, name: str, key: Optional[KeyState]):
+    global _warned_key_clients
+    model = genai.GenerativeModel(name)
+    if key is None or key.index == 0:
+        return model
+    # genai.configure() is process-wide (it holds the first key). Other pool keys
+    # get their own clients, built through the public client_options; the SDK
+    # has no way to hand them to a model, so that part is pinned to known versions.
+    if not _key_clients_supported(genai, model):
+        if not _warned_key_clients:
+            _warned_key_clients = True
+            logger.warning("⚠️ google-generativeai %s can't take per-key clients; all calls use the first key.",
+                           getattr(genai, "__version__", "?"))
+        # Left alone, the model uses the default (first key) client
+        return model
+    from google.ai import generativelanguage as glm
+    options = {"api_key": key.key}
+    model._client = glm.GenerativeServiceClient(client_options=options)
+    model._async_client = glm.GenerativeServiceAsyncClient(client_options=options)
+    return model
+
+
+def get_model(model_name: Optional[str] = None, key: Optional[KeyState] = None) -> "genai.GenerativeModel":
+    name = model_name or GEMINI_MODEL
+    slot = (name, key.index if key is not None else 0)
+    model = _models.get(slot)
+    if model is None:
+        genai = _get_genai()
+        with _models_lock:
+            model = _models.get(slot)
+            if model is None:
+                model = _new_model(genai, name, key)
+                _models[slot] = model
+    return model
+
+
+def warmup():
+    """Load the SDK and build the default model object (no API call is made).
+
+    Models for the other pool keys hold asyncio gRPC clients, which must be
+    created on the server's event loop, so they are built on first use.
+    """
+    if not api_keys():
+        raise RuntimeError("GEMINI_API_KEY not found in environment variables")
+    get_model()
+
+
+def _wrap_error(e: Exception) -> RuntimeError:
+    from google.api_core.exceptions import GoogleAPICallError, ResourceExhausted
+
+    if isinstance(e, ResourceExhausted):
+        metrics.increment("gemini_errors_total", tags={"kind": "quota"})
+        return RuntimeError("Gemini quota exceeded")
+    if isinstance(e, GoogleAPICallError):
+        metrics.increment("gemini_errors_total", tags={"kind": "api"})
+        return RuntimeError(f"Gemini API error: {e}")
+    metrics.increment("gemini_errors_total", tags={"kind": "unknown"})
+    return RuntimeError(f"Gemini unknown error: {e}")
+
+
+def ask_gemini(prompt: str, model_name: Optional[str] = None) -> str:
     """Send `prompt` to Gemini and return text. Reads model from `GEMINI_MODEL`.
 
     Returns a plain string on success or raises an exception on failure so callers
     can handle errors consistently.
     """
     try:
-        model = genai.GenerativeModel(GEMINI_MODEL)
-        response = model.generate_content(prompt)
+        with metrics.timer("gemini_seconds", tags={"mode": "sync"}):
+            response = get_model(model_name).generate_content(prompt)
 
         # response.text is expected; coerce to str for safety
         return str(response.text)
 
-    except ResourceExhausted as e:
-        raise RuntimeError("Gemini quota exceeded") from e
+    except Exception as e:
+        raise _wrap_error(e) from e
 
-    except GoogleAPICallError as e:
-        raise RuntimeError(f"Gemini API error: {e}") from e
 
-    except Exception as e:
-        raise RuntimeError(f"Gemini unknown error: {e}") from e
+def _get_scheduler():
+    return get_scheduler(max_concurrency=GEMINI_MAX_CONCURRENCY)
+
+
+async def ask_gemini_async(prompt: str, model_name: Optional[str] = None, priority: str = INTERACTIVE) -> str:
+    """Non-blocking `ask_gemini` for async endpoints.
+
+    Calls go through the scheduler (rag/gemini_scheduler.py): at most
+    `GEMINI_MAX_CONCURRENCY` in flight, spread over the key pool within each
+    key's budget, interactive before background, and retried on quota errors.
+    """
+    scheduler = _get_scheduler()
+    for attempt in itertools.count():
+        key = await scheduler.acquire(priority)
+        finished = False
+        try:
+            with metrics.timer("gemini_seconds", tags={"mode": "async"}):
+                response = await get_model(model_name, key).generate_content_async(prompt)
+            text = str(response.text)
+        except Exception as e:
+            finished = True
+            if scheduler.finish(key, e, attempt):
+                continue
+            raise _wrap_error(e) from e
+        finally:
+            if not finished:
+                scheduler.finish(key)
+        return text
+
+
+async def stream_gemini_async(prompt: str, model_name: Optional[str] = None,
+                              priority: str = INTERACTIVE) -> AsyncIterator[str]:
+    """Yield response text chunks as Gemini streams them (same scheduler as
+    `ask_gemini_async`; quota errors are retried only before the first chunk)."""
+    scheduler = _get_scheduler()
+    for attempt in itertools.count():
+        key = await scheduler.acquire(priority)
+        started = time.perf_counter()
+        first = True
+        finished = False
+        try:
+            response = await get_model(model_name, key).generate_content_async(prompt, stream=True)
+            async for chunk in response:
+                if first:
+                    first = False
+                    metrics.observe("gemini_first_chunk_seconds", time.perf_counter() - started)
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunks with no text parts (e.g. only a finish reason)
+                    continue
+                if text:
+                    yield text
+            metrics.observe("gemini_seconds", time.perf_counter() - started, tags={"mode": "stream"})
+        except Exception as e:
+            finished = True
+            if scheduler.finish(key, e, attempt if first else scheduler.max_retries):
+                continue
+            raise _wrap_error(e) from e
+        finally:
+            if not finished:
+                scheduler.finish(key)
+        return
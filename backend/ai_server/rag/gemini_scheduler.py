@@ -0,0 +1,198 @@
+"""
+Quota-aware scheduler in front of the async Gemini calls.
+
+- Key pool: `GEMINI_API_KEY` plus `GEMINI_API_KEYS`, used round-robin.
+- Per-key token bucket: `GEMINI_RPM_PER_KEY` requests per minute with bursts of
+  `GEMINI_BURST_PER_KEY` (0 rpm = unlimited, the default).
+- Priorities: "interactive" (chat) is always dispatched before "background"
+  (scoring, assessments). Background calls also leave
+  `GEMINI_INTERACTIVE_RESERVE` of every bucket untouched, so a background
+  backlog only uses spare quota.
+- Quota errors (ResourceExhausted / 429): the key rests for a jittered
+  exponential backoff while the other keys keep serving, and the call is
+  retried up to `GEMINI_MAX_RETRIES` times.
+- At most `GEMINI_MAX_CONCURRENCY` calls are in flight per process.
+
+Queue depth, queue wait, retries and key cooldowns are exported as metrics.
+
+Usage (see rag/gemini_client.py):
+
+    key = await scheduler.acquire(priority)
+    ... call Gemini with key ...
+    retry = scheduler.finish(key, error, attempt)
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import random
+import time
+from typing import List, Optional
+
+from config import (
+    GEMINI_API_KEY,
+    GEMINI_API_KEYS,
+    GEMINI_BACKOFF_BASE,
+    GEMINI_BACKOFF_MAX,
+    GEMINI_BURST_PER_KEY,
+    GEMINI_INTERACTIVE_RESERVE,
+    GEMINI_MAX_RETRIES,
+    GEMINI_RPM_PER_KEY,
+)
+from utils import metrics
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+PRIORITIES = {INTERACTIVE: 0, BACKGROUND: 1}
+
+
+def api_keys() -> List[str]:
+    """The key pool, GEMINI_API_KEY first, without duplicates."""
+    return list(dict.fromkeys(k for k in [GEMINI_API_KEY, *GEMINI_API_KEYS] if k))
+
+
+def is_quota_error(e: Exception) -> bool:
+    try:
+        from google.api_core.exceptions import ResourceExhausted
+        if isinstance(e, ResourceExhausted):
+            return True
+    except ImportError:
+        pass
+    return "429" in str(e)
+
+
+class KeyState:
+    """One API key's token bucket and cooldown. `index` (never the key) labels metrics."""
+
+    def __init__(self, index: int, key: Optional[str], rpm: float, burst: int):
+        self.index = index
+        self.key = key
+        self.rate = rpm / 60.0
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.cooldown_until = 0.0
+        self.failures = 0
+
+    def refill(self, now: float):
+        if self.rate:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def ready_at(self, now: float, reserve: float) -> float:
+        """When this key can take a call that must leave `reserve` tokens behind."""
+        needed = 1 + reserve - self.tokens
+        refill_at = now + needed / self.rate if self.rate and needed > 0 else now
+        return max(self.cooldown_until, refill_at)
+
+
+class GeminiScheduler:
+    def __init__(self, keys: List[Optional[str]], rpm: float = GEMINI_RPM_PER_KEY,
+                 burst: int = GEMINI_BURST_PER_KEY, max_concurrency: int = 256,
+                 reserve: float = GEMINI_INTERACTIVE_RESERVE, max_retries: int = GEMINI_MAX_RETRIES):
+        self.keys = [KeyState(i, key, rpm, burst) for i, key in enumerate(keys or [None])]
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        # Tokens per key that only interactive calls may spend
+        self.reserve_tokens = math.ceil(max(1, burst) * reserve) if rpm else 0
+        self._queue: list = []
+        self._seq = itertools.count()
+        self._next_key = 0
+        self._inflight = 0
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+
+        for name in PRIORITIES:
+            metrics.register_gauge("gemini_queue_depth", lambda name=name: self.depth(name), tags={"priority": name})
+        metrics.register_gauge("gemini_inflight", lambda: self._inflight)
+
+    def depth(self, priority: Optional[str] = None) -> int:
+        level = PRIORITIES.get(priority)
+        return sum(1 for p, _, fut in self._queue if not fut.done() and (level is None or p == level))
+
+    async def acquire(self, priority: str = INTERACTIVE) -> KeyState:
+        """Wait for a concurrency slot and a key with budget; higher priority first, FIFO within one."""
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (PRIORITIES.get(priority, PRIORITIES[BACKGROUND]), next(self._seq), fut))
+        started = time.perf_counter()
+        self._dispatch()
+        try:
+            key = await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # Granted just as the caller went away: hand the slot back
+                self._release()
+            raise
+        metrics.observe("gemini_queue_wait_seconds", time.perf_counter() - started, tags={"priority": priority})
+        return key
+
+    def finish(self, key: KeyState, error: Optional[Exception] = None, attempt: int = 0) -> bool:
+        """Release the slot taken by `acquire`. Returns True if the caller should retry."""
+        retry = False
+        if error is None:
+            key.failures = 0
+        elif is_quota_error(error):
+            key.failures += 1
+            # Equal jitter: half the exponential step is fixed, half random
+            step = min(GEMINI_BACKOFF_MAX, GEMINI_BACKOFF_BASE * 2 ** (key.failures - 1))
+            key.cooldown_until = time.monotonic() + step / 2 + random.uniform(0, step / 2)
+            key.tokens = 0.0
+            metrics.increment("gemini_key_cooldowns_total", tags={"key": key.index})
+            retry = attempt < self.max_retries
+            if retry:
+                metrics.increment("gemini_retries_total")
+        self._release()
+        return retry
+
+    def _release(self):
+        self._inflight -= 1
+        self._dispatch()
+
+    def _pick_key(self, now: float, reserve: float) -> Optional[KeyState]:
+        n = len(self.keys)
+        for i in range(n):
+            key = self.keys[(self._next_key + i) % n]
+            key.refill(now)
+            if key.ready_at(now, reserve) <= now:
+                self._next_key = (key.index + 1) % n
+                return key
+        return None
+
+    def _dispatch(self):
+        now = time.monotonic()
+        while self._queue and self._inflight < self.max_concurrency:
+            level, _, fut = self._queue[0]
+            if fut.done():
+                # Cancelled while waiting
+                heapq.heappop(self._queue)
+                continue
+            reserve = 0 if level == PRIORITIES[INTERACTIVE] else self.reserve_tokens
+            key = self._pick_key(now, reserve)
+            if key is None:
+                self._schedule_wakeup(min(k.ready_at(now, reserve) for k in self.keys) - now)
+                return
+            heapq.heappop(self._queue)
+            if key.rate:
+                key.tokens -= 1
+            self._inflight += 1
+            metrics.increment("gemini_calls_total", tags={"key": key.index})
+            fut.set_result(key)
+
+    def _schedule_wakeup(self, delay: float):
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+        self._wakeup = asyncio.get_running_loop().call_later(max(delay, 0.001), self._on_wakeup)
+
+    def _on_wakeup(self):
+        self._wakeup = None
+        self._dispatch()
+
+
+_scheduler: Optional[GeminiScheduler] = None
+
+
+def get_scheduler(max_concurrency: int = 256) -> GeminiScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = GeminiScheduler(api_keys(), max_concurrency=max_concurrency)
+    return _scheduler
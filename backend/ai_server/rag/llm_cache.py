@@ -0,0 +1,231 @@
+"""
+Response cache for Gemini calls.
+
+Keys are a SHA-256 of (model name, index version, final prompt), so a reseed
+invalidates cached RAG answers while everything else stays warm. Entries
+expire after `LLM_CACHE_TTL` seconds and the least recently used entries are
+evicted once `LLM_CACHE_MAX_ENTRIES` is reached.
+
+Backends:
+- "memory"  per-process OrderedDict (default)
+- "sqlite"  on-disk table at `LLM_CACHE_PATH`, shared by workers on one host
+- "off"     no caching (in-flight deduplication still applies)
+
+Concurrent identical requests are collapsed ("singleflight"): the first caller
+makes the Gemini call and the others await its result.
+
+The sqlite backend runs on its own single thread (`get_async` / `set_async`),
+never on the event loop. Its LRU bookkeeping is batched: a hit refreshes
+`accessed_at` at most every `SQLITE_TOUCH_INTERVAL` seconds, and expired or
+surplus rows are deleted every `SQLITE_PRUNE_EVERY` inserts or
+`SQLITE_PRUNE_INTERVAL` seconds, so the table can briefly exceed the limit.
+"""
+
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, Optional
+
+from config import LLM_CACHE_BACKEND, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_PATH, LLM_CACHE_TTL
+from rag.gemini_client import GEMINI_MODEL, ask_gemini_async
+from rag.gemini_scheduler import INTERACTIVE
+from utils import metrics
+
+
+def cache_key(prompt: str, model_name: Optional[str] = None, index_version: Optional[str] = None) -> str:
+    h = hashlib.sha256()
+    for part in (model_name or GEMINI_MODEL, index_version or "", prompt):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class MemoryCacheBackend:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: float):
+        with self._lock:
+            self._data[key] = (time.time() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+SQLITE_TOUCH_INTERVAL = 60.0
+SQLITE_PRUNE_EVERY = 100
+SQLITE_PRUNE_INTERVAL = 60.0
+
+
+class SQLiteCacheBackend:
+    def __init__(self, path: str, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # One thread does all sqlite work, so the event loop never waits on disk or locks
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llm-cache")
+        self._inserts = 0
+        self._pruned_at = time.monotonic()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at)")
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at, accessed_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] < now:
+                # Expired rows are left for the next prune
+                return None
+            if now - row[2] > SQLITE_TOUCH_INTERVAL:
+                self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, key: str, value: str, ttl: float):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now + ttl, now),
+            )
+            self._inserts += 1
+            if self._inserts >= SQLITE_PRUNE_EVERY or time.monotonic() - self._pruned_at > SQLITE_PRUNE_INTERVAL:
+                self._prune(now)
+
+    def _prune(self, now: float):
+        """Delete expired rows, then the least recently used beyond `max_entries`, in one transaction."""
+        self._inserts = 0
+        self._pruned_at = time.monotonic()
+        with self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.execute("DELETE FROM llm_cache WHERE expires_at < ?", (now,))
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                " SELECT key FROM llm_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+
+class LLMCache:
+    def __init__(self, backend=None, ttl: float = LLM_CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def get(self, key: str) -> Optional[str]:
+        if self.backend is None:
+            return None
+        value = self.backend.get(key)
+        metrics.increment("llm_cache_hits_total" if value is not None else "llm_cache_misses_total")
+        return value
+
+    def set(self, key: str, value: str):
+        if self.backend is not None:
+            self.backend.set(key, value, self.ttl)
+
+    async def _run(self, fn, *args):
+        # Blocking backends (sqlite) bring their own executor; the memory backend runs inline
+        executor = getattr(self.backend, "executor", None)
+        if executor is None:
+            return fn(*args)
+        return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+    async def get_async(self, key: str) -> Optional[str]:
+        return await self._run(self.get, key)
+
+    async def set_async(self, key: str, value: str):
+        await self._run(self.set, key, value)
+
+    async def get_or_call(self, key: str, call: Callable[[], Awaitable[str]]) -> str:
+        while True:
+            value = await self.get_async(key)
+            if value is not None:
+                return value
+
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            metrics.increment("llm_cache_inflight_dedup_total")
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                # The leading caller went away; try again (possibly as the new leader)
+
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            value = await call()
+        except asyncio.CancelledError:
+            self._inflight.pop(key, None)
+            fut.cancel()
+            raise
+        except Exception as e:
+            self._inflight.pop(key, None)
+            fut.set_exception(e)
+            fut.exception()  # mark retrieved when nobody else was waiting
+            raise
+
+        # Waiters get the answer now; the entry stays in flight until the cache write lands
+        fut.set_result(value)
+        try:
+            await self.set_async(key, value)
+        finally:
+            self._inflight.pop(key, None)
+        return value
+
+
+_cache: Optional[LLMCache] = None
+
+
+def get_llm_cache() -> LLMCache:
+    global _cache
+    if _cache is None:
+        backend_name = LLM_CACHE_BACKEND.lower()
+        if backend_name == "sqlite":
+            backend = SQLiteCacheBackend(LLM_CACHE_PATH, LLM_CACHE_MAX_ENTRIES)
+        elif backend_name == "off":
+            backend = None
+        else:
+            backend = MemoryCacheBackend(LLM_CACHE_MAX_ENTRIES)
+        _cache = LLMCache(backend)
+    return _cache
+
+
+async def ask_gemini_cached(prompt: str, model_name: Optional[str] = None, index_version: Optional[str] = None,
+                            priority: str = INTERACTIVE) -> str:
+    """`ask_gemini_async` through the response cache and in-flight deduplication."""
+    key = cache_key(prompt, model_name, index_version)
+    return await get_llm_cache().get_or_call(key, lambda: ask_gemini_async(prompt, model_name, priority))
@@ -3,10 +3,11 @@
 Prompt builder for RAG pipeline.
 
 Provides:
-- build_rag_prompt(question, context, instructions=None, max_context_chars=3000)
+- build_rag_prompt(question, context, instructions=None, max_context_chars=None)
 
 Behavior:
-- Keeps the tail of the retrieved context up to max_context_chars (so the most recent/relevant text is used).
+- Expects context already packed best-first within a token budget (rag/context_packer.py).
+- With max_context_chars, keeps the leading chunks that fit, so the best-ranked text survives.
 - Sanitizes whitespace.
 - Returns a single string prompt ready to be passed to the LLM.
 """
@@ -28,29 +29,29 @@ def _sanitize(text: str) -> str:
     text = text.strip()
     return text
 
-def _tail_truncate(text: str, max_chars: int) -> str:
-    """Keep the last max_chars of the text (preserve boundaries if possible)."""
-    if not text:
-        return ""
-    if len(text) <= max_chars:
+def _head_truncate(text: str, max_chars: int) -> str:
+    """Keep the leading chunks (blank-line separated) that fit in max_chars."""
+    if not text or len(text) <= max_chars:
         return text
-    # Attempt to cut at a newline boundary near the start of the tail for cleaner context
-    tail = text[-max_chars:]
-    nl_pos = tail.find("\n")
-    if nl_pos > 0 and nl_pos < max_chars // 10:
-        # if the first newline in the tail is very early, strip up to it to avoid broken paragraph
-        tail = tail[nl_pos+1:]
-    return tail
+    kept = []
+    size = 0
+    for chunk in text.split("\n\n"):
+        size += len(chunk) + (2 if kept else 0)
+        if size > max_chars:
+            break
+        kept.append(chunk)
+    # A first chunk longer than the limit is cut rather than dropped
+    return "\n\n".join(kept) if kept else text[:max_chars]
 
-def build_rag_prompt(question: str, context: str, instructions: Optional[str] = None, max_context_chars: int = 3000) -> str:
+def build_rag_prompt(question: str, context: str, instructions: Optional[str] = None, max_context_chars: Optional[int] = None) -> str:
     """
     Build a single prompt for the LLM using question and retrieved context.
 
     Args:
       question: user's question.
-      context: concatenated retrieved document chunks (string).
+      context: concatenated retrieved document chunks (string), best first.
       instructions: optional system instructions override.
-      max_context_chars: maximum characters to include from the context (tail kept).
+      max_context_chars: optional character cap on the context (leading chunks kept).
 
     Returns:
       prompt string
@@ -58,7 +59,7 @@ def build_rag_prompt(question: str, context: str, instructions: Optional[str] =
     instructions = instructions or DEFAULT_INSTRUCTIONS
     q = _sanitize(question)
     ctx = _sanitize(context)
-    ctx_trunc = _tail_truncate(ctx, max_context_chars)
+    ctx_trunc = _head_truncate(ctx, max_context_chars) if max_context_chars else ctx
 
     prompt = f"""System instructions:
 {instructions}
@@ -1,23 +1,26 @@
 # rag/rag_pipeline.py
 
+import asyncio
+import logging
 import numpy as np
-from typing import List
-from config import EMBED_MODEL
-from sentence_transformers import SentenceTransformer
-
-from vector_db.faiss_client import load_faiss, load_documents
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
+from vector_db.faiss_client import IndexSnapshot, get_vector_store
 from rag.prompts import build_rag_prompt
-from rag.gemini_client import ask_gemini
-
+from rag.context_packer import CONTEXT_SEPARATOR, format_hit, pack_context
+from rag.gemini_client import ask_gemini, stream_gemini_async
+from rag.llm_cache import ask_gemini_cached, cache_key, get_llm_cache
+from rag.semantic_cache import get_semantic_cache
+from rag.embedder import embed
+from rag.embed_batcher import embed_async
+from utils import metrics
+from config import RAG_CANDIDATES, RAG_TOP_K
 
-# Load embedder once to avoid slow reloads
-encoder = SentenceTransformer(EMBED_MODEL)
+logger = logging.getLogger(__name__)
 
 
 def _embed(text: str) -> np.ndarray:
-    """Return embedding as float32 vector."""
-    emb = encoder.encode([text])[0]
-    return np.array(emb, dtype="float32")
+    """Return embedding as float32 vector (shared, cached encoder)."""
+    return embed(text)
 
 
 # Simple small-talk detector: bypass RAG for short conversational queries
@@ -57,44 +60,90 @@ def is_small_talk(text: str) -> bool:
     return clean in SMALL_TALK
 
 
-def retrieve_context(query: str, k: int = 5) -> str:
+def retrieve_context(query: str, k: int = RAG_TOP_K, sources: Optional[Iterable[str]] = None) -> str:
     """
-    Retrieve top-k similar document chunks.
-    Returns a single concatenated string.
+    Retrieve up to k document chunks, optionally only from `sources`
+    (source file names, e.g. ["Reddit_Title.csv"]), packed by
+    rag/context_packer.py (diverse, no near-duplicates, within the token budget).
+    Returns a single concatenated string, best chunk first.
     """
+    return format_context(_retrieve(_embed(query), k, sources))
 
-    index = load_faiss()
-    documents = load_documents()
 
-    if index.ntotal == 0 or len(documents) == 0:
-        return ""
+async def retrieve_async(query: str, k: int = RAG_TOP_K, sources: Optional[Iterable[str]] = None) -> List[dict]:
+    """Packed hits for `query`; the query embedding goes through the micro-batcher."""
+    query_emb = await embed_async(query)
+    hits, _ = await asyncio.to_thread(_retrieve_versioned, query_emb, k, sources)
+    return hits
 
-    query_emb = _embed(query).reshape(1, -1)
-    distances, indices = index.search(query_emb, k)
 
-    chunks: List[str] = []
+async def retrieve_context_async(query: str, k: int = RAG_TOP_K, sources: Optional[Iterable[str]] = None) -> str:
+    """Async `retrieve_context`."""
+    return format_context(await retrieve_async(query, k, sources))
+
+
+def _retrieve(query_emb: np.ndarray, k: int, sources: Optional[Iterable[str]] = None,
+              snapshot: Optional[IndexSnapshot] = None) -> List[dict]:
+    """Search `RAG_CANDIDATES` candidates and pack up to k of them."""
+    hits = _search(query_emb, max(k, RAG_CANDIDATES), sources, vectors=True, snapshot=snapshot)
+    return pack_context(hits, max_chunks=k)
 
-    for idx in indices[0]:
-        # FAISS may return -1 for empty slots; skip invalid indices
-        if idx is None or idx < 0 or idx >= len(documents):
-            continue
 
-        doc = documents[idx]
+def _retrieve_versioned(query_emb: np.ndarray, k: int, sources: Optional[Iterable[str]] = None):
+    """`_retrieve` plus the index version it searched. Blocking (a due reload runs here): call off the loop."""
+    snapshot = get_vector_store().snapshot()
+    return _retrieve(query_emb, k, sources, snapshot), snapshot.version
 
+
+def _search(query_emb: np.ndarray, k: int, sources: Optional[Iterable[str]] = None,
+            vectors: bool = False, snapshot: Optional[IndexSnapshot] = None) -> List[dict]:
+    """Search the in-memory shards; returns hits as {id, source, text, distance} (+ vector)."""
+    hits: List[dict] = []
+    if snapshot is None:
+        snapshot = get_vector_store().snapshot()
+
+    for dist, _, doc, *vector in snapshot.search(query_emb, k, sources, vectors):
         # Support dict-shaped documents or plain strings
         if isinstance(doc, dict):
             text = doc.get("text") or ""
             source = doc.get("source") or doc.get("source_path") or "<unknown>"
+            doc_id = doc.get("id")
         else:
             text = str(doc)
             source = "<unknown>"
+            doc_id = None
 
         if not text:
             continue
 
-        chunks.append(f"[source: {source}] {text}")
+        hit = {"id": doc_id, "source": source, "text": text, "distance": float(dist)}
+        if vectors:
+            hit["vector"] = vector[0]
+        hits.append(hit)
+
+    return hits
+
+
+def format_context(hits: List[dict]) -> str:
+    return CONTEXT_SEPARATOR.join(map(format_hit, hits))
 
-    return "\n\n".join(chunks)
+
+def citations(hits: List[dict]) -> List[dict]:
+    """Source citations for the hits, in rank order."""
+    return [{"id": h["id"], "source": h["source"], "distance": h["distance"]} for h in hits]
+
+
+def _error_answer(e: Exception) -> str:
+    err = str(e)
+
+    if "429" in err or "quota" in err.lower():
+        metrics.increment("rate_limit_responses_total", tags={"endpoint": "chat"})
+        return (
+            "Gemini API quota exhausted. Please try again later "
+            "or upgrade your plan."
+        )
+
+    return f"RAG pipeline failed: {err}"
 
 
 def get_answer(question: str) -> str:
@@ -107,38 +156,122 @@ def get_answer(question: str) -> str:
     """
 
     # If the query is small-talk, bypass retrieval and ask Gemini directly
-    print("Question:", question)
-    print("Is small talk:", is_small_talk(question))
-    if is_small_talk(question):
+    small_talk = is_small_talk(question)
+    logger.debug("Question: %r (small talk: %s)", question, small_talk)
+    if small_talk:
         try:
             return ask_gemini(question)
         except Exception as e:
-            err = str(e)
-            if "429" in err or "quota" in err.lower():
-                return (
-                    "Gemini API quota exhausted. Please try again later "
-                    "or upgrade your plan."
-                )
-            return f"RAG pipeline failed: {err}"
+            return _error_answer(e)
+
+    # 0. Opt-in semantic cache: reuse the answer to a paraphrased question
+    semantic = get_semantic_cache()
+    if semantic is not None:
+        version = get_vector_store().snapshot().version
+        query_emb = _embed(question)
+        cached = semantic.lookup(query_emb, version)
+        if cached is not None:
+            return cached["answer"]
 
     # 1. Retrieve docs
     context = retrieve_context(question)
 
     # 2. Build prompt
-    prompt = build_rag_prompt(question=question, context=context)
+    with metrics.timer("prompt_build_seconds"):
+        prompt = build_rag_prompt(question=question, context=context)
 
     # 3. Ask Gemini (with error handling)
     try:
         response = ask_gemini(prompt)
-        return response
+    except Exception as e:
+        return _error_answer(e)
+
+    if semantic is not None:
+        semantic.store(query_emb, question, response, [], version)
+    return response
 
+
+async def _build_prompt_async(question: str):
+    """Return (prompt, hits, index_version); small talk skips retrieval."""
+    if is_small_talk(question):
+        return question, [], None
+    # The snapshot (and any due reload) is taken off the event loop, with the search
+    query_emb = await embed_async(question)
+    hits, version = await asyncio.to_thread(_retrieve_versioned, query_emb, RAG_TOP_K)
+    with metrics.timer("prompt_build_seconds"):
+        prompt = build_rag_prompt(question=question, context=format_context(hits))
+    return prompt, hits, version
+
+
+async def _semantic_lookup_async(question: str):
+    """Return (cached entry or None, query embedding, index version) when the semantic cache is on."""
+    if get_semantic_cache() is None or is_small_talk(question):
+        return None, None, None
+    query_emb = await embed_async(question)
+    # snapshot() may reload the index and the lookup scans the cache: both off the loop
+    cached, version = await asyncio.to_thread(_semantic_lookup, query_emb)
+    return cached, query_emb, version
+
+
+def _semantic_lookup(query_emb: np.ndarray):
+    version = get_vector_store().snapshot().version
+    return get_semantic_cache().lookup(query_emb, version), version
+
+
+async def get_answer_async(question: str) -> str:
+    """Async `get_answer` for the /chat endpoint (batched embedding, cached LLM call)."""
+    cached, query_emb, version = await _semantic_lookup_async(question)
+    if cached is not None:
+        return cached["answer"]
+
+    prompt, hits, version = await _build_prompt_async(question)
+
+    try:
+        answer = await ask_gemini_cached(prompt, index_version=version)
+    except Exception as e:
+        return _error_answer(e)
+
+    if query_emb is not None:
+        # FAISS add/remove under the cache lock: off the loop, like the lookup
+        await asyncio.to_thread(get_semantic_cache().store, query_emb, question, answer, citations(hits), version)
+    return answer
+
+
+async def stream_answer_async(question: str) -> AsyncIterator[Tuple[str, object]]:
+    """
+    Streaming variant of `get_answer_async`. Yields events:
+    - ("chunk", text)       as Gemini produces text
+    - ("sources", [...])    once, after the last chunk
+    - ("error", message)    instead of the remaining events on failure
+    """
+    cached, query_emb, version = await _semantic_lookup_async(question)
+    if cached is not None:
+        yield "chunk", cached["answer"]
+        yield "sources", cached["sources"]
+        return
+
+    prompt, hits, version = await _build_prompt_async(question)
+    cache = get_llm_cache()
+    key = cache_key(prompt, index_version=version)
+
+    cached = await cache.get_async(key)
+    if cached is not None:
+        yield "chunk", cached
+        yield "sources", citations(hits)
+        return
+
+    parts = []
+    try:
+        async for text in stream_gemini_async(prompt):
+            parts.append(text)
+            yield "chunk", text
     except Exception as e:
-        err = str(e)
+        yield "error", _error_answer(e)
+        return
 
-        if "429" in err or "quota" in err.lower():
-            return (
-                "Gemini API quota exhausted. Please try again later "
-                "or upgrade your plan."
-            )
+    answer = "".join(parts)
+    await cache.set_async(key, answer)
+    if query_emb is not None:
+        await asyncio.to_thread(get_semantic_cache().store, query_emb, question, answer, citations(hits), version)
 
-        return f"RAG pipeline failed: {err}"
+    yield "sources", citations(hits)
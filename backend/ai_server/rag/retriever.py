@@ -1,31 +1,22 @@
-import numpy as np
-import faiss
 
 from rag.embedder import embed
-from vector_db.faiss_client import load_faiss, load_documents
+from vector_db.faiss_client import get_vector_store
 
 TOP_K = 5
 
 def retrieve_relevant_context(query: str):
     """Search FAISS and return top K doc chunks as context."""
 
-    # Load memory index + docs
-    index = load_faiss()
-    docs = load_documents()
+    # In-memory shards + docs, hot-reloaded when the seeder publishes
+    snapshot = get_vector_store().snapshot()
 
-    if len(docs) == 0:
+    if snapshot.ntotal == 0:
         return "No documents available in FAISS."
 
     # Embed query
-    query_vec = embed(query).astype("float32").reshape(1, -1)
+    query_vec = embed(query)
 
-    # Run FAISS search
-    distances, ids = index.search(query_vec, TOP_K)
-
-    results = []
-    for idx in ids[0]:
-        if idx == -1 or idx >= len(docs):
-            continue
-        results.append(docs[idx]["text"])
+    # Run FAISS search across shards
+    results = [doc["text"] for _, _, doc in snapshot.search(query_vec, TOP_K)]
 
     return "\n".join(results)
@@ -0,0 +1,112 @@
+"""
+Semantic answer cache for /chat.
+
+Paraphrased questions ("how do I stop stressing about work" / "how to stop
+work stress at home") would otherwise each cost a retrieval and a Gemini round
+trip. Past query embeddings live in a small dedicated FAISS inner-product
+index over L2-normalized vectors, so the score of the nearest neighbour is its
+cosine similarity. A neighbour at or above `SEMANTIC_CACHE_THRESHOLD` whose
+answer was produced against the current document index version is a hit.
+
+Opt-in via `SEMANTIC_CACHE_ENABLED`; capacity is bounded by
+`SEMANTIC_CACHE_MAX_ENTRIES` with least-recently-used eviction.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+
+from config import SEMANTIC_CACHE_ENABLED, SEMANTIC_CACHE_MAX_ENTRIES, SEMANTIC_CACHE_THRESHOLD
+from utils import metrics
+
+
+def _normalize(vec: np.ndarray) -> np.ndarray:
+    vec = np.asarray(vec, dtype="float32").reshape(1, -1)
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm > 0 else vec
+
+
+class SemanticCache:
+    def __init__(self, threshold: float = SEMANTIC_CACHE_THRESHOLD, max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES):
+        self.threshold = threshold
+        self.max_entries = max(1, max_entries)
+        self._index = None  # created on first store, once the dimension is known
+        self._entries: "OrderedDict[int, dict]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stale": 0, "evictions": 0}
+
+    def _remove(self, entry_id: int):
+        self._entries.pop(entry_id, None)
+        self._index.remove_ids(np.array([entry_id], dtype="int64"))
+
+    def lookup(self, query_emb: np.ndarray, index_version: Optional[str]) -> Optional[dict]:
+        """Return the cached entry {query, answer, sources, ...} for a similar query, or None."""
+        with self._lock:
+            entry = None
+            if self._index is not None and self._index.ntotal > 0:
+                scores, ids = self._index.search(_normalize(query_emb), 1)
+                entry_id = int(ids[0][0])
+                if entry_id >= 0 and scores[0][0] >= self.threshold:
+                    entry = self._entries.get(entry_id)
+                    if entry is not None and entry["index_version"] != index_version:
+                        # Answer was built from documents that have since changed
+                        self._remove(entry_id)
+                        self._stats["stale"] += 1
+                        metrics.increment("semantic_cache_stale_total")
+                        entry = None
+                    elif entry is not None:
+                        self._entries.move_to_end(entry_id)
+
+            outcome = "hits" if entry is not None else "misses"
+            self._stats[outcome] += 1
+            metrics.increment(f"semantic_cache_{outcome}_total")
+            return entry
+
+    def store(self, query_emb: np.ndarray, query: str, answer: str,
+              sources: List[dict], index_version: Optional[str]):
+        vec = _normalize(query_emb)
+        with self._lock:
+            if self._index is None:
+                import faiss
+                self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(vec.shape[1]))
+
+            entry_id = self._next_id
+            self._next_id += 1
+            self._index.add_with_ids(vec, np.array([entry_id], dtype="int64"))
+            self._entries[entry_id] = {
+                "query": query,
+                "answer": answer,
+                "sources": sources,
+                "index_version": index_version,
+                "created_at": time.time(),
+            }
+
+            while len(self._entries) > self.max_entries:
+                oldest_id = next(iter(self._entries))
+                self._remove(oldest_id)
+                self._stats["evictions"] += 1
+                metrics.increment("semantic_cache_evictions_total")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "size": len(self._entries), "max_entries": self.max_entries}
+
+
+_cache: Optional[SemanticCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_semantic_cache() -> Optional[SemanticCache]:
+    """The process-wide cache, or None when `SEMANTIC_CACHE_ENABLED` is off."""
+    global _cache
+    if not SEMANTIC_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SemanticCache()
+    return _cache
@@ -1,12 +1,56 @@
+"""
+Seed the FAISS index from `DOCS_DIR`.
+
+Staged, streaming pipeline:
+1. Load/chunk: files are parsed and chunked in a process pool
+   (`SEED_WORKERS`); PDFs are split into page ranges so big PDFs are
+   extracted page-parallel. Workers send chunks back in blocks (`BLOCK_SIZE`
+   CSV rows or chunks, or one PDF page range) through a bounded queue, so a
+   worker waits instead of parsing far ahead of the embedder, and no file is
+   ever held whole. At most two tasks per worker are in flight.
+2. Embed: each block goes into `embed_batch` in batches of
+   `SEED_EMBED_BATCH_SIZE` while the pool keeps parsing.
+3. Write: vectors are added to the file's shard index in slices of
+   `SEED_FLUSH_SIZE`, and documents are appended to its document store on
+   disk as they come. IVF/int8/PQ indexes (`FAISS_INDEX_TYPE`) are trained
+   first, on the first `FAISS_TRAIN_SAMPLE` vectors (or all of them for
+   smaller corpora).
+
+Every source file is its own shard (index + document store). Seeding is
+incremental (see `vector_db/manifest.py`): unchanged files keep their shard,
+changed files get a freshly built shard, deleted files lose theirs. The new
+shard set is published in one step once everything is written.
+"""
+
+import argparse
+import multiprocessing
 import os
-from config import SUPPORTED, DOCS_DIR
+import time
+from itertools import islice
+from queue import Empty
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from config import (
+    SUPPORTED, DOCS_DIR, SEED_WORKERS, SEED_EMBED_BATCH_SIZE, SEED_FLUSH_SIZE, FAISS_TRAIN_SAMPLE,
+)
 from loaders.txt_loader import load_txt
 from loaders.md_loader import load_md
-from loaders.pdf_loader import load_pdf
+from loaders.pdf_loader import load_pdf, load_pdf_pages, pdf_page_ranges
 from loaders.docx_loader import load_docx
-from loaders.csv_loader import load_csv
-from chunker.text_chunker import chunk_text
-from vector_db.faiss_client import add_documents
+from loaders.csv_loader import load_csv, load_csv_rows
+from chunker.text_chunker import chunk_text, chunk_texts
+from rag.embedder import embed_batch
+from vector_db.doc_store import DocStoreWriter
+from vector_db.faiss_client import new_doc_store_writer, new_index, publish, read_published, shard_exists, write_shard
+from vector_db.index_factory import build_index, describe, index_spec, train_index
+from vector_db.manifest import load_manifest, save_manifest, file_sha256
+
+# Bump when loading/chunking changes so every file is re-indexed on the next run
+PIPELINE_VERSION = 4
+# CSV rows (or chunks of other files) per block sent from a worker
+BLOCK_SIZE = 1000
 
 # Map extension → loader function
 LOADERS = {
@@ -17,42 +61,327 @@ LOADERS = {
     ".csv": load_csv
 }
 
-def seed():
-    docs = []
 
+def _blocks(chunks):
+    while True:
+        block = [{"text": chunk, "metadata": {}} for chunk in islice(chunks, BLOCK_SIZE)]
+        if not block:
+            return
+        yield block
+
+
+def chunk_blocks(file_path, page_range=None):
+    """Yield one file's (or one PDF page range's) chunks as lists of {"text": ..., "metadata": {...}}."""
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext == ".pdf":
+        yield from _blocks(iter(chunk_text(load_pdf_pages(file_path, *page_range) + "\n")))
+    elif ext == ".csv":
+        # One document per row, keeping label/hashtags; over-long rows are still chunked
+        rows = load_csv_rows(file_path)
+        while True:
+            block = list(islice(rows, BLOCK_SIZE))
+            if not block:
+                break
+            yield [
+                {"text": chunk, "metadata": row["metadata"]}
+                for row, chunks in zip(block, chunk_texts(r["text"] for r in block))
+                for chunk in chunks
+            ]
+    else:
+        yield from _blocks(iter(chunk_text(LOADERS[ext](file_path))))
+
+
+def stream_chunks(queue, filename, part, file_path, page_range=None):
+    """Worker task: send ("chunks", filename, part, block) messages, then ("done", ...).
+
+    `queue.put` blocks while the queue is full, which is what keeps memory bounded.
+    """
+    try:
+        for block in chunk_blocks(file_path, page_range):
+            queue.put(("chunks", filename, part, block))
+        queue.put(("done", filename, part, None))
+    except BaseException as e:
+        queue.put(("error", filename, part, f"{type(e).__name__}: {e}"))
+        raise
+
+
+class EmbeddingWriter:
+    """Stage 2 + 3: embed chunks in batches and add them to the index in slices."""
+
+    def __init__(self, index, documents: DocStoreWriter, batch_size=SEED_EMBED_BATCH_SIZE, flush_size=SEED_FLUSH_SIZE):
+        self.index = index
+        self.documents = documents
+        self.batch_size = batch_size
+        self.flush_size = flush_size
+        self._pending_docs, self._pending_ids = [], []
+        self._vectors, self._vector_ids, self._vector_docs = [], [], []
+        self._buffered = 0
+        self.embedded = 0
+        self.train_size = FAISS_TRAIN_SAMPLE
+
+    def add(self, doc, doc_id):
+        self._pending_docs.append(doc)
+        self._pending_ids.append(doc_id)
+        if len(self._pending_docs) >= self.batch_size:
+            self._embed()
+
+    def _embed(self):
+        if not self._pending_docs:
+            return
+        vectors = embed_batch([d["text"] for d in self._pending_docs], batch_size=self.batch_size)
+        self._vectors.append(vectors)
+        self._vector_ids.extend(self._pending_ids)
+        self._vector_docs.extend(self._pending_docs)
+        self._buffered += len(self._pending_docs)
+        self.embedded += len(self._pending_docs)
+        self._pending_docs, self._pending_ids = [], []
+        if self._buffered >= self.flush_size:
+            self._write()
+
+    def _write(self, final=False):
+        if not self._buffered:
+            return
+        if not self.index.is_trained:
+            # Keep buffering until there is a full training sample (or no more input)
+            if self._buffered < self.train_size and not final:
+                return
+            vectors = np.vstack(self._vectors)
+            if self.index.ntotal == 0:
+                # Size nlist / PQ codebooks for what is actually being indexed
+                self.index = build_index(self.index.d, n_vectors=len(vectors))
+            print(f"🎓 Training index on {min(len(vectors), self.train_size)} vectors")
+            train_index(self.index, vectors, self.train_size)
+        self.index.add_with_ids(np.vstack(self._vectors), np.asarray(self._vector_ids, dtype="int64"))
+        for doc_id, doc in zip(self._vector_ids, self._vector_docs):
+            self.documents.add(doc_id, doc)
+        self._vectors, self._vector_ids, self._vector_docs = [], [], []
+        self._buffered = 0
+
+    def flush(self):
+        self._embed()
+        self._write(final=True)
+
+
+class FileJob:
+    """One source file being indexed: its load tasks, and its shard as the blocks arrive in order."""
+
+    def __init__(self, filename, file_path, stat, digest):
+        self.filename, self.file_path, self.stat, self.digest = filename, file_path, stat, digest
+        is_pdf = os.path.splitext(filename)[1].lower() == ".pdf"
+        # An empty PDF still gets one (empty) part, so the file completes like any other
+        self.parts = (pdf_page_ranges(file_path) or [(0, 0)]) if is_pdf else [None]
+        self.futures = []
+        self.writer = EmbeddingWriter(new_index(), new_doc_store_writer())
+        self.chunks = 0
+        self._next_part = 0
+        # Blocks of PDF page ranges that finished before the ranges ahead of them
+        self._early = {}
+
+    @property
+    def in_flight(self):
+        return len(self.futures) - self._next_part
+
+    @property
+    def unsubmitted(self):
+        return len(self.futures) < len(self.parts)
+
+    @property
+    def done(self):
+        return self._next_part == len(self.parts)
+
+    def submit_next(self, pool, queue):
+        """Queue the next part (the whole file, or the next PDF page range)."""
+        part = len(self.futures)
+        self.futures.append(pool.submit(stream_chunks, queue, self.filename, part, self.file_path, self.parts[part]))
+
+    def receive(self, kind, part, block, manifest):
+        """Handle one worker message; parts are consumed strictly in order."""
+        if part != self._next_part:
+            self._early.setdefault(part, []).append((kind, block))
+            return
+        self._consume(kind, block, manifest)
+        while self._next_part in self._early and not self.done:
+            for kind, block in self._early.pop(self._next_part):
+                self._consume(kind, block, manifest)
+
+    def _consume(self, kind, block, manifest):
+        if kind == "done":
+            self._next_part += 1
+            return
+        for chunk in block:
+            doc = {
+                "id": f"{self.filename}_{self.chunks}",
+                "source": self.filename,
+                "text": chunk["text"]
+            }
+            if chunk["metadata"]:
+                doc["metadata"] = chunk["metadata"]
+            # Vector ids are unique across shards; files being loaded side by side interleave them
+            self.writer.add(doc, manifest["next_id"])
+            manifest["next_id"] += 1
+            self.chunks += 1
+
+    def check_workers(self):
+        """Raise the error of a crashed worker that could not report it (e.g. killed)."""
+        for f in self.futures:
+            if f.done() and f.exception() is not None:
+                raise f.exception()
+
+
+def seed(rebuild=()):
+    """Bring the FAISS shards in line with `DOCS_DIR`.
+
+    `rebuild` names source files whose shards are re-indexed even if unchanged.
+    """
     print("\n🚀 Starting FAISS seeding...")
     print(f"📂 Scanning docs folder: {DOCS_DIR}\n")
+    started = time.perf_counter()
+
+    manifest = load_manifest()
+    files = manifest["files"]
+    published = read_published()
+    shards = dict(published["shards"] or {})
+    changed = False
+
+    # Legacy single index, or FAISS_INDEX_TYPE (or its structural parameters) changed: rebuild from scratch
+    spec = index_spec()
+    if published["shards"] is None or manifest.get("index_spec", "flat") != spec:
+        if published["version"] is not None:
+            print(f"♻️ Index layout changed (→ sharded {spec}); re-seeding everything.")
+        files.clear()
+        shards.clear()
+        manifest["index_spec"] = spec
+        changed = True
+
+    # The manifest and the published shards must describe the same files
+    for filename in [f for f in files if f not in shards or not shard_exists(shards[f])]:
+        print(f"⚠️ Shard missing for {filename}; re-seeding it.")
+        files.pop(filename)
+        shards.pop(filename, None)
+        changed = True
+    for filename in [f for f in shards if f not in files]:
+        shards.pop(filename)
+        changed = True
 
-    for filename in os.listdir(DOCS_DIR):
+    on_disk = {}
+    for filename in sorted(os.listdir(DOCS_DIR)):
         ext = os.path.splitext(filename)[1].lower()
 
         if ext not in SUPPORTED:
             print(f"❌ Skipped (unsupported): {filename}")
             continue
+        on_disk[filename] = os.path.join(DOCS_DIR, filename)
 
-        file_path = os.path.join(DOCS_DIR, filename)
-        print(f"📄 Processing: {filename}")
+    for filename in [f for f in files if f not in on_disk]:
+        files.pop(filename)
+        removed = shards.pop(filename)["vectors"]
+        print(f"🗑️ Removed: {filename} ({removed} vectors)")
+        changed = True
 
-        loader = LOADERS[ext]
-        text = loader(file_path)
+    if manifest.get("pipeline_version") != PIPELINE_VERSION:
+        # Nothing indexed yet (fresh seed): just record the version
+        if files:
+            print("♻️ Loader/chunker changed since the last seed; re-indexing all files.")
+            for entry in files.values():
+                entry["sha256"] = entry["mtime_ns"] = None
+        manifest["pipeline_version"] = PIPELINE_VERSION
 
-        chunks = chunk_text(text)
-        print(f"   ➜ {len(chunks)} chunks")
+    for filename in rebuild:
+        if filename not in on_disk:
+            print(f"❌ Not in {DOCS_DIR}: {filename}")
+        elif filename in files:
+            files[filename]["sha256"] = files[filename]["mtime_ns"] = None
 
-        for i, chunk in enumerate(chunks):
-            docs.append({
-                "id": f"{filename}_{i}",
-                "text": chunk
-            })
+    manifest_dirty = changed
+    todo = []
+    for filename, file_path in on_disk.items():
+        stat = os.stat(file_path)
+        entry = files.get(filename)
 
-    if docs:
-        print("\n🔄 Embedding & Storing in FAISS...")
-        add_documents(docs)
-    else:
-        print("⚠️ No documents to process.")
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            print(f"⏭️ Unchanged: {filename}")
+            continue
+
+        digest = file_sha256(file_path)
+        if entry and entry["sha256"] == digest:
+            # Touched but not modified
+            entry.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+            manifest_dirty = True
+            print(f"⏭️ Unchanged: {filename}")
+            continue
+
+        todo.append((filename, file_path, stat, digest))
+
+    if todo:
+        embedded = 0
+        workers = SEED_WORKERS or os.cpu_count() or 1
+        # The manager exits first: on an error its queue goes away, so blocked workers fail
+        # instead of waiting forever and the pool can shut down
+        with ProcessPoolExecutor(max_workers=workers) as pool, multiprocessing.Manager() as manager:
+            # Bounded: a full queue blocks the workers until the embedder catches up
+            queue = manager.Queue(maxsize=2 * workers)
+            waiting = list(todo)
+            jobs = {}
+            while waiting or jobs:
+                # Keep the pool busy without parsing far ahead of the embedder
+                while sum(job.in_flight for job in jobs.values()) < 2 * workers:
+                    job = next((j for j in jobs.values() if j.unsubmitted), None)
+                    if job is None:
+                        if not waiting:
+                            break
+                        job = FileJob(*waiting.pop(0))
+                        jobs[job.filename] = job
+                        print(f"📄 Processing: {job.filename}")
+                    job.submit_next(pool, queue)
 
-    print("\n✅ DONE: FAISS vector database seeded!\n")
+                try:
+                    kind, filename, part, block = queue.get(timeout=1)
+                except Empty:
+                    for job in jobs.values():
+                        job.check_workers()
+                    continue
+                if kind == "error":
+                    raise RuntimeError(f"❌ Loading {filename} failed: {block}")
+
+                job = jobs[filename]
+                job.receive(kind, part, block, manifest)
+                if not job.done:
+                    continue
+
+                # Each source file is its own shard, rebuilt without touching the others
+                del jobs[filename]
+                writer = job.writer
+                writer.flush()
+                embedded += writer.embedded
+                try:
+                    shards[filename] = write_shard(filename, writer.index, writer.documents)
+                finally:
+                    writer.documents.close()
+                files[filename] = {
+                    "sha256": job.digest,
+                    "size": job.stat.st_size,
+                    "mtime_ns": job.stat.st_mtime_ns,
+                    "vectors": job.chunks,
+                }
+                print(f"   ➜ {filename}: {job.chunks} chunks, shard: {describe(writer.index)}")
+                changed = manifest_dirty = True
+
+        elapsed = time.perf_counter() - started
+        print(f"\n🔄 Embedded {embedded} chunks in {elapsed:.1f}s ({embedded / max(elapsed, 1e-9):.0f}/s)")
+
+    if changed:
+        publish(shards)
+        save_manifest(manifest)
+        total = sum(entry["vectors"] for entry in shards.values())
+        print(f"\n✅ DONE: FAISS vector database seeded ({len(shards)} shards, {total} vectors)!\n")
+    else:
+        if manifest_dirty:
+            save_manifest(manifest)
+        print("\n✅ DONE: FAISS index already up to date.\n")
 
 
 if __name__ == "__main__":
-    seed()
+    parser = argparse.ArgumentParser(description="Seed the FAISS shards from DOCS_DIR.")
+    parser.add_argument("--rebuild", nargs="+", default=[], metavar="FILE",
+                        help="re-index these source files' shards even if unchanged")
+    seed(rebuild=parser.parse_args().rebuild)
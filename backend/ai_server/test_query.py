@@ -1,22 +1,21 @@
-import numpy as np
-from vector_db.faiss_client import load_faiss, load_documents, model
+from rag.embedder import embed
+from vector_db.faiss_client import get_vector_store
 
 def test_query():
-    index = load_faiss()
-    docs = load_documents()
+    snapshot = get_vector_store().refresh(force=True)
 
     query = "What is this project about?"
     print(f"❓ Query: {query}")
 
-    q_embed = model.encode([query]).astype("float32")
+    q_embed = embed(query)
 
     k = 3
-    distances, indices = index.search(q_embed, k)
+    matches = snapshot.search(q_embed, k)
 
     print("\n🔍 Top Matches:")
-    for i, idx in enumerate(indices[0]):
+    for i, (distance, idx, doc) in enumerate(matches):
         print(f"\n----- Match {i+1} -----")
-        print(docs[idx]["text"][:500])
+        print(doc["text"][:500])
 
 if __name__ == "__main__":
     test_query()
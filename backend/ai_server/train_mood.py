@@ -0,0 +1,123 @@
+"""
+Train the local mood classifier (`mood/classifier.py`) on the labeled CSVs in
+`DOCS_DIR` and save it to `MOOD_MODEL_PATH`.
+
+    python train_mood.py
+    python train_mood.py --l2 4 --out mood_classifier.npz
+
+Rows are de-duplicated (texts labeled both ways are dropped) and split into
+train / calibration / test sets. The report shows accuracy, log-loss and
+expected calibration error on the test set, before and after calibration, and
+how much of it would be answered locally at a few confidence thresholds.
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from config import DOCS_DIR, MOOD_MODEL_PATH, EMBED_MODEL
+from loaders.csv_loader import load_csv_rows
+from rag.embedder import embed_batch, normalize_text
+from mood.classifier import MoodClassifier, classify_many, fit_logistic, fit_platt
+
+
+def labeled_rows(docs_dir=DOCS_DIR):
+    """(texts, labels, sources) from every CSV with a 0/1 label column."""
+    by_text = {}
+    for filename in sorted(os.listdir(docs_dir)):
+        if not filename.lower().endswith(".csv"):
+            continue
+        for row in load_csv_rows(os.path.join(docs_dir, filename)):
+            label = row["metadata"].get("label")
+            if label not in ("0", "1"):
+                continue
+            key = normalize_text(row["text"])
+            if key in by_text and by_text[key][1] != int(label):
+                by_text[key] = None  # contradictory duplicates
+            elif key not in by_text:
+                by_text[key] = (row["text"], int(label), filename)
+    rows = [r for r in by_text.values() if r is not None]
+    return [r[0] for r in rows], np.asarray([r[1] for r in rows], dtype="float64"), [r[2] for r in rows]
+
+
+def log_loss(p, y):
+    p = np.clip(p, 1e-7, 1 - 1e-7)
+    return float(-np.mean(y * np.log(p) + (1 - y) * np.log(1 - p)))
+
+
+def expected_calibration_error(p, y, bins=10):
+    """Mean |confidence - accuracy| of the predicted side, weighted over confidence bins."""
+    confidence = np.maximum(p, 1 - p)
+    correct = (p >= 0.5) == (y == 1)
+    edges = np.linspace(0.5, 1.0, bins + 1)
+    which = np.clip(np.digitize(confidence, edges) - 1, 0, bins - 1)
+    return float(sum(
+        abs(confidence[which == b].mean() - correct[which == b].mean()) * (which == b).mean()
+        for b in range(bins) if (which == b).any()
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", default=DOCS_DIR)
+    parser.add_argument("--out", default=MOOD_MODEL_PATH)
+    parser.add_argument("--l2", type=float, default=1.0, help="L2 penalty on the weights")
+    parser.add_argument("--test-size", type=float, default=0.2)
+    parser.add_argument("--calibration-size", type=float, default=0.1)
+    args = parser.parse_args()
+
+    texts, y, sources = labeled_rows(args.docs)
+    if len(set(y.tolist())) < 2:
+        raise SystemExit(f"❌ Need labeled rows of both classes in {args.docs}")
+    print(f"📚 {len(texts)} labeled texts ({int(y.sum())} distress) from {len(set(sources))} files")
+
+    started = time.perf_counter()
+    X = embed_batch(texts, show_progress_bar=True)
+    print(f"🔄 Embedded in {time.perf_counter() - started:.1f}s")
+
+    order = np.random.default_rng(0).permutation(len(texts))
+    n_test = int(len(order) * args.test_size)
+    n_cal = int(len(order) * args.calibration_size)
+    test, cal, train = order[:n_test], order[n_test:n_test + n_cal], order[n_test + n_cal:]
+
+    weights, bias = fit_logistic(X[train], y[train], l2=args.l2)
+    raw = MoodClassifier(weights, bias)
+    platt = fit_platt(raw.logits(X[cal]).astype("float64"), y[cal])
+    meta = {
+        "embed_model": EMBED_MODEL,
+        "trained_at": int(time.time()),
+        "l2": args.l2,
+        "train_size": len(train),
+        "sources": sorted(set(sources)),
+    }
+
+    p_raw = raw.predict_proba(X[test])
+    model = MoodClassifier(weights, bias, platt, meta)
+    p = model.predict_proba(X[test])
+    accuracy = float(((p >= 0.5) == (y[test] == 1)).mean())
+    meta.update(test_accuracy=round(accuracy, 4), test_ece=round(expected_calibration_error(p, y[test]), 4))
+
+    print(f"\n{'':<12} {'accuracy':>9} {'log-loss':>9} {'ECE':>7}")
+    for name, probs in (("raw", p_raw), ("calibrated", p)):
+        print(f"{name:<12} {((probs >= 0.5) == (y[test] == 1)).mean():>9.3f} "
+              f"{log_loss(probs, y[test]):>9.3f} {expected_calibration_error(probs, y[test]):>7.3f}")
+
+    print(f"\n{'threshold':<12} {'local':>9} {'accuracy':>9}")
+    confidence = 100 * np.maximum(p, 1 - p)
+    for threshold in (60, 70, 80, 90):
+        local = confidence >= threshold
+        acc = ((p[local] >= 0.5) == (y[test][local] == 1)).mean() if local.any() else float("nan")
+        print(f"{threshold:<12} {local.mean():>9.1%} {acc:>9.3f}")
+
+    model.save(args.out)
+    print(f"\n💾 Saved mood classifier to {args.out} ({os.path.getsize(args.out) / 1024:.0f} KB)")
+
+    started = time.perf_counter()
+    classify_many(texts[:256], model)
+    print(f"⚡ {min(len(texts), 256) / (time.perf_counter() - started):.0f} texts/s end to end on this machine")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Simple in-memory metrics collector for debug/ops.
+
+Counters and histograms are keyed by metric name plus an optional dict of
+tags; gauges are callbacks read at scrape time. Everything lives in process
+memory and is read back via get_metrics() (JSON) or render_prometheus()
+(Prometheus text exposition format).
+"""
+
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Sequence
+
+# Seconds; suits everything from a cached embed to a slow Gemini call
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_lock = threading.Lock()
+_counters: Dict[tuple, float] = {}
+_histograms: Dict[tuple, dict] = {}
+_gauges: Dict[tuple, Callable[[], float]] = {}
+
+
+def _key(name: str, tags: Optional[dict]) -> tuple:
+    return (name, tuple(sorted((tags or {}).items())))
+
+
+def increment(name: str, value: float = 1, tags: Optional[dict] = None):
+    key = _key(name, tags)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name: str, value: float, tags: Optional[dict] = None, buckets: Sequence[float] = DEFAULT_BUCKETS):
+    key = _key(name, tags)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = {"buckets": tuple(buckets), "counts": [0] * (len(buckets) + 1), "sum": 0.0, "count": 0}
+            _histograms[key] = hist
+        hist["counts"][bisect_left(hist["buckets"], value)] += 1
+        hist["sum"] += value
+        hist["count"] += 1
+
+
+@contextmanager
+def timer(name: str, tags: Optional[dict] = None, buckets: Sequence[float] = DEFAULT_BUCKETS):
+    """Observe the wall time of the `with` block (seconds) into histogram `name`."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, tags, buckets)
+
+
+def register_gauge(name: str, read: Callable[[], float], tags: Optional[dict] = None):
+    """Expose `read()` as gauge `name`; it is called on every scrape."""
+    with _lock:
+        _gauges[_key(name, tags)] = read
+
+
+def _read_gauges() -> Dict[tuple, float]:
+    with _lock:
+        gauges = dict(_gauges)
+    values = {}
+    for key, read in gauges.items():
+        try:
+            values[key] = float(read())
+        except Exception:
+            # A gauge that cannot be read right now is left out of this scrape
+            continue
+    return values
+
+
+def _label(name: str, tags: tuple) -> str:
+    if not tags:
+        return name
+    return name + "{" + ",".join(f"{k}={v}" for k, v in tags) + "}"
+
+
+def get_metrics() -> dict:
+    with _lock:
+        counters = {_label(n, t): v for (n, t), v in _counters.items()}
+        histograms = {
+            _label(n, t): {
+                "count": h["count"],
+                "sum": h["sum"],
+                "buckets": dict(zip([*map(str, h["buckets"]), "+Inf"], h["counts"])),
+            }
+            for (n, t), h in _histograms.items()
+        }
+    gauges = {_label(n, t): v for (n, t), v in _read_gauges().items()}
+    return {"counters": counters, "histograms": histograms, "gauges": gauges}
+
+
+def _prom_name(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_:]", "_", name)
+
+
+def _prom_labels(tags: tuple) -> str:
+    if not tags:
+        return ""
+    pairs = []
+    for k, v in tags:
+        v = str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{_prom_name(k)}="{v}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _prom_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render_prometheus() -> str:
+    """All metrics in the Prometheus text format (histogram buckets are cumulative)."""
+    # Series of one metric must be adjacent, so sort by name (tags as strings: values may mix types)
+    order = lambda item: (item[0][0], str(item[0][1]))
+    with _lock:
+        counters = sorted(_counters.items(), key=order)
+        histograms = sorted(((key, {**h, "counts": list(h["counts"])}) for key, h in _histograms.items()), key=order)
+    lines = []
+    typed = set()
+
+    def declare(name, kind):
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} {kind}")
+
+    for (name, tags), value in counters:
+        name = _prom_name(name)
+        declare(name, "counter")
+        lines.append(f"{name}{_prom_labels(tags)} {_prom_value(value)}")
+
+    for (name, tags), h in histograms:
+        name = _prom_name(name)
+        declare(name, "histogram")
+        cumulative = 0
+        for le, count in zip([*(format(b, "g") for b in h["buckets"]), "+Inf"], h["counts"]):
+            cumulative += count
+            lines.append(f"{name}_bucket{_prom_labels((*tags, ('le', le)))} {cumulative}")
+        lines.append(f"{name}_sum{_prom_labels(tags)} {_prom_value(h['sum'])}")
+        lines.append(f"{name}_count{_prom_labels(tags)} {h['count']}")
+
+    for (name, tags), value in sorted(_read_gauges().items(), key=order):
+        name = _prom_name(name)
+        declare(name, "gauge")
+        lines.append(f"{name}{_prom_labels(tags)} {_prom_value(value)}")
+
+    return "\n".join(lines) + "\n"
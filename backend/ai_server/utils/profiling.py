@@ -0,0 +1,168 @@
+"""On-demand request profiling.
+
+A request is profiled when it carries `X-Profile: <PROFILE_TOKEN>` or is
+picked at random at `PROFILE_SAMPLE_RATE`. With neither configured, main.py
+does not install the middleware at all, so normal requests pay nothing.
+
+Two modes:
+- "sample" (default): a background thread samples the stacks of every thread
+  every `PROFILE_INTERVAL_MS` and writes them as folded stacks
+  (`<id>.folded`, one "thread;frame;frame count" line per stack). This covers
+  work off the event loop too (encoder, FAISS threads). Open it in speedscope
+  or feed it to flamegraph.pl. Other requests running at the same time show
+  up as well.
+- "cprofile": deterministic cProfile of the event-loop thread, written as
+  `<id>.pstats` (read it with `python -m pstats` or snakeviz).
+
+One request is profiled at a time; others selected meanwhile run unprofiled.
+The artifact id is returned in the `X-Profile-Id` response header; the file is
+written in a background thread just after the response ends. Only the
+newest `PROFILE_MAX_ARTIFACTS` files are kept in `PROFILE_DIR`.
+"""
+
+import cProfile
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Optional
+
+from config import (
+    PROFILE_DIR,
+    PROFILE_INTERVAL_MS,
+    PROFILE_MAX_ARTIFACTS,
+    PROFILE_MODE,
+    PROFILE_SAMPLE_RATE,
+    PROFILE_TOKEN,
+)
+from utils import metrics
+
+REQUEST_HEADER = "x-profile"
+RESPONSE_HEADER = "X-Profile-Id"
+
+# cProfile allows one active profiler, and a stack sampler already sees every thread
+_active = threading.Lock()
+
+
+def enabled() -> bool:
+    return bool(PROFILE_TOKEN) or PROFILE_SAMPLE_RATE > 0
+
+
+def should_profile(headers) -> bool:
+    token = headers.get(REQUEST_HEADER)
+    if token and PROFILE_TOKEN and hmac.compare_digest(token, PROFILE_TOKEN):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    # Function granularity (first line), so one function is one flame-graph node
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Counts the stacks of all other threads at a fixed interval."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def save(self, path: str):
+        # stop() only signals; the last sample may still be in progress
+        self._thread.join()
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class CProfiler:
+    def __init__(self):
+        self._profile = cProfile.Profile()
+
+    def start(self):
+        self._profile.enable()
+
+    def stop(self):
+        self._profile.disable()
+
+    def save(self, path: str):
+        self._profile.dump_stats(path)
+
+
+def _prune():
+    files = sorted(
+        (os.path.join(PROFILE_DIR, name) for name in os.listdir(PROFILE_DIR)),
+        key=os.path.getmtime,
+    )
+    for path in files[:max(0, len(files) - PROFILE_MAX_ARTIFACTS)]:
+        os.remove(path)
+
+
+class RequestProfile:
+    """One profiled request: `start()`, then `finish()` once the response body is sent."""
+
+    def __init__(self, mode: str = PROFILE_MODE):
+        self.id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        if mode == "cprofile":
+            self._profiler, ext = CProfiler(), "pstats"
+        else:
+            self._profiler, ext = StackSampler(PROFILE_INTERVAL_MS / 1000), "folded"
+        self.path = os.path.join(PROFILE_DIR, f"{self.id}.{ext}")
+
+    def start(self) -> Optional["RequestProfile"]:
+        """Start profiling; None if another request is being profiled."""
+        if not _active.acquire(blocking=False):
+            metrics.increment("profiles_skipped_total")
+            return None
+        self._profiler.start()
+        return self
+
+    def finish(self, tags: Optional[dict] = None):
+        """Stop profiling; the artifact is written (and old ones pruned) in a thread.
+
+        Called on the event loop: cProfile must be disabled from the thread it
+        profiles, but the disk work must not hold up other requests.
+        """
+        try:
+            self._profiler.stop()
+        except BaseException:
+            _active.release()
+            raise
+        threading.Thread(target=self._save, args=(tags,), name="profile-save").start()
+
+    def _save(self, tags: Optional[dict]):
+        # The next profile waits until this one is on disk
+        try:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            self._profiler.save(self.path)
+            _prune()
+        finally:
+            _active.release()
+        metrics.increment("profiles_captured_total", tags=tags)
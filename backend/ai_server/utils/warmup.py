@@ -0,0 +1,70 @@
+"""Startup warmup and readiness state behind /healthz and /readyz.
+
+The process answers /healthz as soon as it is up. The heavy loads (embedding
+model, FAISS shards, Gemini SDK) run once, in order, on a background thread,
+and each phase is timed. /readyz only turns 200 after every phase succeeded,
+so a rolling deploy sends traffic to warm pods only.
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+_started = time.monotonic()
+_lock = threading.Lock()
+_thread: Optional[threading.Thread] = None
+_phases: dict = {}
+_state = {"status": "pending", "started_at": None, "finished_at": None}
+
+
+def uptime() -> float:
+    return time.monotonic() - _started
+
+
+def record(name: str, seconds: float, error: Optional[str] = None):
+    with _lock:
+        _phases[name] = {"seconds": round(seconds, 4), "ok": error is None, **({"error": error} if error else {})}
+    metrics.observe("warmup_phase_seconds", seconds, tags={"phase": name})
+
+
+def run(phases: List[Tuple[str, Callable[[], object]]]):
+    """Run every phase in order, timing each; a failed phase is recorded and the rest still run."""
+    with _lock:
+        _state.update(status="warming", started_at=round(uptime(), 4))
+    for name, fn in phases:
+        started = time.perf_counter()
+        try:
+            fn()
+            record(name, time.perf_counter() - started)
+        except Exception as e:
+            record(name, time.perf_counter() - started, f"{type(e).__name__}: {e}")
+            logger.error("❌ Warmup phase %s failed: %s", name, e)
+    with _lock:
+        failed = [name for name, phase in _phases.items() if not phase["ok"]]
+        _state.update(status="failed" if failed else "ready", finished_at=round(uptime(), 4))
+    logger.info("🔥 Warmup %s in %.2fs.", _state["status"], _state["finished_at"] - _state["started_at"])
+
+
+def start(phases: List[Tuple[str, Callable[[], object]]]) -> threading.Thread:
+    """Run the warmup on a daemon thread (once per process)."""
+    global _thread
+    with _lock:
+        if _thread is None:
+            _thread = threading.Thread(target=run, args=(phases,), name="warmup", daemon=True)
+            _thread.start()
+        return _thread
+
+
+def status() -> dict:
+    with _lock:
+        return {
+            **_state,
+            "ready": _state["status"] == "ready",
+            "uptime_s": round(uptime(), 3),
+            "phases": {name: dict(phase) for name, phase in _phases.items()},
+        }
@@ -0,0 +1,132 @@
+"""
+Memory-mapped document store.
+
+One file holds every chunk, laid out as:
+
+    header   magic (8 bytes) + record count n (uint64)
+    ids      n sorted int64 FAISS vector ids
+    offsets  n + 1 int64 byte offsets into the blob
+    blob     UTF-8 JSON records, back to back
+
+Opening the store maps the file and reads nothing; a record is decoded only
+when a search returns its id. Servers therefore start instantly and share the
+text through the page cache instead of each holding the corpus as Python
+objects. No pickle is involved.
+"""
+
+import json
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+from array import array
+from collections.abc import Mapping
+from typing import Iterator, Optional
+
+import numpy as np
+
+MAGIC = b"NWDOCS01"
+HEADER = struct.Struct("<8sQ")
+COPY_BUFFER = 1 << 20
+
+
+class DocStoreWriter:
+    """Build a store file incrementally, with ids added in increasing order.
+
+    Records go straight to an unnamed temporary file in `tmp_dir` (keep it on
+    the shard disk, not a RAM-backed /tmp), so only the ids and offsets (16
+    bytes per record) stay in memory. `finish(path)` writes the final file.
+    """
+
+    def __init__(self, tmp_dir: Optional[str] = None):
+        self._blob = tempfile.TemporaryFile(dir=tmp_dir)
+        self._ids = array("q")
+        self._offsets = array("q", [0])
+
+    def add(self, doc_id: int, doc):
+        doc_id = int(doc_id)
+        if self._ids and doc_id <= self._ids[-1]:
+            raise ValueError(f"❌ Document ids must increase: {doc_id} after {self._ids[-1]}")
+        record = json.dumps(doc, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self._blob.write(record)
+        self._ids.append(doc_id)
+        self._offsets.append(self._offsets[-1] + len(record))
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def finish(self, path):
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, len(self._ids)))
+            f.write(np.frombuffer(self._ids, dtype="=i8").astype("<i8").tobytes())
+            f.write(np.frombuffer(self._offsets, dtype="=i8").astype("<i8").tobytes())
+            self._blob.seek(0)
+            shutil.copyfileobj(self._blob, f, COPY_BUFFER)
+
+    def close(self):
+        self._blob.close()
+
+
+def write_doc_store(path, docs: Mapping):
+    """Write `docs` ({vector id: document}) to `path` in the layout above."""
+    writer = DocStoreWriter(os.path.dirname(os.path.abspath(path)))
+    try:
+        for doc_id in sorted(int(i) for i in docs):
+            writer.add(doc_id, docs[doc_id])
+        writer.finish(path)
+    finally:
+        writer.close()
+
+
+class DocumentStore(Mapping):
+    """Read-only {vector id: document} view over a store file (or empty)."""
+
+    def __init__(self, path: Optional[str] = None):
+        self._mm = None
+        self._ids = np.zeros(0, dtype="<i8")
+        self._offsets = np.zeros(1, dtype="<i8")
+        self._blob = 0
+        if path is None:
+            return
+
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, n = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"❌ Not a document store: {path}")
+        self._ids = np.frombuffer(self._mm, dtype="<i8", count=n, offset=HEADER.size)
+        self._offsets = np.frombuffer(self._mm, dtype="<i8", count=n + 1, offset=HEADER.size + 8 * n)
+        self._blob = HEADER.size + 8 * (2 * n + 1)
+
+    def _position(self, key) -> int:
+        try:
+            key = int(key)
+        except (TypeError, ValueError):
+            return -1
+        pos = int(np.searchsorted(self._ids, key))
+        return pos if pos < len(self._ids) and self._ids[pos] == key else -1
+
+    def __getitem__(self, key) -> dict:
+        pos = self._position(key)
+        if pos < 0:
+            raise KeyError(key)
+        start, end = self._blob + int(self._offsets[pos]), self._blob + int(self._offsets[pos + 1])
+        return json.loads(self._mm[start:end])
+
+    def __contains__(self, key) -> bool:
+        return self._position(key) >= 0
+
+    def __iter__(self) -> Iterator[int]:
+        return (int(i) for i in self._ids)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def nbytes(self) -> int:
+        """Size of the mapped file (resident only as far as it has been read)."""
+        return len(self._mm) if self._mm is not None else 0
+
+
+def open_doc_store(path) -> DocumentStore:
+    return DocumentStore(path if os.path.exists(path) else None)
@@ -1,43 +1,324 @@
-import faiss
+import heapq
+import json
+import logging
 import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional
+
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from config import EMBED_MODEL
+from config import FAISS_RELOAD_INTERVAL, FAISS_SEARCH_THREADS
+from rag.embedder import embedding_dimension
+from utils import metrics
+from vector_db.doc_store import DocStoreWriter, DocumentStore, open_doc_store, write_doc_store
+# faiss and vector_db.index_factory are imported where used, so importing this module stays cheap
+
+# One shard (index + document store) per source file
+SHARDS_DIR = "faiss_shards"
+# Published shard listing, written last by every seed so readers never pick up
+# a half-written set: {"version": ..., "shards": {name: {"index": ..., "documents": ...}}}
+INDEX_VERSION_PATH = "faiss.version"
 
+# Single-index layout written by older versions; served until the next seed replaces it
 FAISS_INDEX_PATH = "faiss.index"
-DOC_STORE_PATH = "faiss_docs.npy"
+DOC_STORE_PATH = "faiss_docs.bin"
+LEGACY_DOC_STORE_PATH = "faiss_docs.npy"
+LEGACY_SHARD = "*"
 
-model = SentenceTransformer(EMBED_MODEL)
+logger = logging.getLogger(__name__)
 
-def load_faiss():
-    if os.path.exists(FAISS_INDEX_PATH):
-        index = faiss.read_index(FAISS_INDEX_PATH)
-        print("🔌 FAISS index loaded.")
-    else:
-        index = faiss.IndexFlatL2(model.get_sentence_embedding_dimension())
-        print("🆕 New FAISS index created.")
-    return index
+def new_index():
+    """Empty index of the configured type (`FAISS_INDEX_TYPE`), keyed by our own ids."""
+    from vector_db.index_factory import build_index
+    return build_index(embedding_dimension())
 
-def save_faiss(index):
-    faiss.write_index(index, FAISS_INDEX_PATH)
-    print("💾 Saved FAISS index.")
+def _as_id_map(index):
+    import faiss
+    # Indexes seeded before ids existed: a bare flat index where row i had implicit id i
+    if not isinstance(index, faiss.IndexFlat):
+        return index
+    id_map = faiss.IndexIDMap2(faiss.IndexFlatL2(index.d))
+    if index.ntotal:
+        id_map.add_with_ids(index.reconstruct_n(0, index.ntotal), np.arange(index.ntotal, dtype="int64"))
+    return id_map
 
-def save_documents(docs):
-    np.save(DOC_STORE_PATH, np.array(docs, dtype=object))
-    print("💾 Stored documents metadata.")
+def atomic_replace(path, write):
+    """Write via `write(tmp_path)` and move it over `path` in one rename."""
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
 
-def load_documents():
+def _open_legacy_documents() -> Mapping[int, dict]:
     if os.path.exists(DOC_STORE_PATH):
-        return np.load(DOC_STORE_PATH, allow_pickle=True).tolist()
-    return []
+        return open_doc_store(DOC_STORE_PATH)
+    if not os.path.exists(LEGACY_DOC_STORE_PATH):
+        return DocumentStore()
+    stored = np.load(LEGACY_DOC_STORE_PATH, allow_pickle=True)
+    if stored.ndim == 0:
+        return stored.item()
+    # Legacy list store: position == vector id
+    return dict(enumerate(stored.tolist()))
+
+def _shard_file(name: str, token: str, ext: str) -> str:
+    safe = re.sub(r"[^\w.-]+", "_", name)
+    return f"{safe}.{token}.{ext}"
+
+def new_doc_store_writer() -> DocStoreWriter:
+    """A streaming document store for a shard being seeded, buffered on the shard disk."""
+    os.makedirs(SHARDS_DIR, exist_ok=True)
+    return DocStoreWriter(SHARDS_DIR)
+
+def write_shard(name: str, index, documents) -> dict:
+    """Write one shard under fresh file names and return its listing entry.
+
+    `documents` is a {vector id: document} mapping or a `DocStoreWriter`.
+    Nothing is served from it until `publish()` lists it.
+    """
+    import faiss
+    os.makedirs(SHARDS_DIR, exist_ok=True)
+    token = f"{time.time_ns():x}"
+    entry = {
+        "index": _shard_file(name, token, "index"),
+        "documents": _shard_file(name, token, "docs"),
+        "vectors": int(index.ntotal),
+    }
+    atomic_replace(os.path.join(SHARDS_DIR, entry["index"]), lambda p: faiss.write_index(index, p))
+    atomic_replace(os.path.join(SHARDS_DIR, entry["documents"]), (
+        documents.finish if isinstance(documents, DocStoreWriter) else lambda p: write_doc_store(p, documents)
+    ))
+    return entry
+
+def shard_exists(entry: dict) -> bool:
+    return all(os.path.exists(os.path.join(SHARDS_DIR, entry[key])) for key in ("index", "documents"))
+
+def read_published() -> dict:
+    """The published listing; "shards" is None for the legacy single-index layout."""
+    try:
+        with open(INDEX_VERSION_PATH) as f:
+            raw = f.read().strip()
+    except FileNotFoundError:
+        raw = ""
+    if raw.startswith("{"):
+        return json.loads(raw)
+    if not raw:
+        # Indexes seeded before version files existed: fall back to mtimes
+        try:
+            raw = f"{os.stat(FAISS_INDEX_PATH).st_mtime_ns}:{os.stat(LEGACY_DOC_STORE_PATH).st_mtime_ns}"
+        except FileNotFoundError:
+            raw = None
+    return {"version": raw, "shards": None}
+
+def read_index_version() -> Optional[str]:
+    return read_published()["version"]
+
+def publish(shards: Dict[str, dict]):
+    """Make `shards` the live set under a new version; running servers hot-reload on change.
+
+    Shard files nothing lists any more (and the legacy single index) are
+    deleted afterwards.
+    """
+    listing = {"version": str(time.time_ns()), "shards": shards}
+
+    def write(path):
+        with open(path, "w") as f:
+            json.dump(listing, f, indent=1)
+    atomic_replace(INDEX_VERSION_PATH, write)
+
+    live = {entry[key] for entry in shards.values() for key in ("index", "documents")}
+    if os.path.isdir(SHARDS_DIR):
+        for filename in os.listdir(SHARDS_DIR):
+            if filename not in live and ".tmp." not in filename:
+                os.remove(os.path.join(SHARDS_DIR, filename))
+    for path in (FAISS_INDEX_PATH, DOC_STORE_PATH, LEGACY_DOC_STORE_PATH):
+        if os.path.exists(path):
+            os.remove(path)
+    print(f"📢 Published {len(shards)} shards.")
+
+
+class Shard(NamedTuple):
+    name: str
+    index: "faiss.Index"
+    documents: Mapping[int, dict]
+    # Index file name; an unchanged shard is reused across reloads
+    key: Optional[str] = None
+
+
+def _read_index(path: str):
+    import faiss
+    from vector_db.index_factory import apply_search_params
+    return apply_search_params(_as_id_map(faiss.read_index(path)))
+
+def load_shard(name: str, entry: dict) -> Shard:
+    index = _read_index(os.path.join(SHARDS_DIR, entry["index"]))
+    documents = DocumentStore(os.path.join(SHARDS_DIR, entry["documents"]))
+    return Shard(name, index, documents, entry["index"])
+
+
+_search_pool: Optional[ThreadPoolExecutor] = None
+_search_pool_lock = threading.Lock()
+
+def _get_search_pool() -> ThreadPoolExecutor:
+    global _search_pool
+    if _search_pool is None:
+        with _search_pool_lock:
+            if _search_pool is None:
+                workers = FAISS_SEARCH_THREADS or min(8, os.cpu_count() or 1)
+                _search_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="faiss-search")
+    return _search_pool
+
+def _search_shard(shard: Shard, query: np.ndarray, k: int, sources, vectors: bool = False) -> List[tuple]:
+    distances, ids = shard.index.search(query, k)
+    hits = []
+    for dist, idx in zip(distances[0], ids[0]):
+        # FAISS may return -1 for empty slots; skip invalid ids
+        doc = shard.documents.get(int(idx))
+        if doc is None:
+            continue
+        # Only the legacy single shard mixes sources
+        if sources and isinstance(doc, dict) and doc.get("source") not in sources:
+            continue
+        hits.append((float(dist), int(idx), doc))
+    if vectors:
+        stored = _reconstruct(shard.index, [idx for _, idx, _ in hits])
+        hits = [(*hit, None if stored is None else stored[i]) for i, hit in enumerate(hits)]
+    return hits
+
+def _reconstruct(index, ids: List[int]) -> Optional[np.ndarray]:
+    """Stored vectors for `ids` (approximate for lossy types); None if the index cannot reconstruct."""
+    if not ids:
+        return None
+    try:
+        return index.reconstruct_batch(np.asarray(ids, dtype="int64"))
+    except RuntimeError:
+        return None
+
+
+class IndexSnapshot(NamedTuple):
+    version: Optional[str]
+    shards: Dict[str, Shard]
+
+    @property
+    def ntotal(self) -> int:
+        return sum(s.index.ntotal for s in self.shards.values())
+
+    def search(self, query_emb: np.ndarray, k: int, sources: Optional[Iterable[str]] = None,
+               vectors: bool = False) -> List[tuple]:
+        """Top-k (distance, vector id, document) across shards, nearest first.
+
+        `sources` limits the search to those source files' shards. Shards are
+        searched in parallel (FAISS releases the GIL) and merged by distance.
+        With `vectors=True` each hit also carries its stored vector (None if
+        the index cannot reconstruct it).
+        """
+        sources = set(sources) if sources else None
+        if LEGACY_SHARD in self.shards:
+            shards = [self.shards[LEGACY_SHARD]]
+        else:
+            shards = [s for name, s in self.shards.items() if sources is None or name in sources]
+            sources = None
+        shards = [s for s in shards if s.index.ntotal]
+        query = np.asarray(query_emb, dtype="float32").reshape(1, -1)
+
+        with metrics.timer("faiss_search_seconds"):
+            if len(shards) > 1:
+                results = _get_search_pool().map(lambda s: _search_shard(s, query, k, sources, vectors), shards)
+            else:
+                results = [_search_shard(s, query, k, sources, vectors) for s in shards]
+            return heapq.nsmallest(k, (hit for hits in results for hit in hits), key=lambda hit: hit[0])
+
+    def doc_store_bytes(self) -> int:
+        return sum(s.documents.nbytes() for s in self.shards.values() if isinstance(s.documents, DocumentStore))
+
+
+class VectorStore:
+    """Process-wide, in-memory FAISS shards + memory-mapped documents with hot reload.
+
+    Shards are loaded once and every search is served from memory; document
+    text is read from the mapped stores only for the hits. At most every
+    `reload_interval` seconds the published listing is checked; when the
+    seeder publishes a new version, the shards that changed are loaded off to
+    the side (unchanged ones are reused) and swapped in as one immutable
+    snapshot, so in-flight searches keep the snapshot they started with.
+    """
+
+    def __init__(self, reload_interval: float = FAISS_RELOAD_INTERVAL):
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._snapshot = IndexSnapshot(None, {})
+        self._loaded = False
+        self._last_check = 0.0
+
+    def _load(self, published: dict) -> Optional[IndexSnapshot]:
+        version = published["version"]
+        if published["shards"] is None:
+            if not os.path.exists(FAISS_INDEX_PATH):
+                return IndexSnapshot(version, {})
+            index = _read_index(FAISS_INDEX_PATH)
+            shards = {LEGACY_SHARD: Shard(LEGACY_SHARD, index, _open_legacy_documents())}
+        else:
+            shards = {}
+            try:
+                for name, entry in published["shards"].items():
+                    current = self._snapshot.shards.get(name)
+                    if current is not None and current.key == entry["index"]:
+                        shards[name] = current
+                    else:
+                        shards[name] = load_shard(name, entry)
+            except FileNotFoundError:
+                # Superseded by a newer publish while loading; retry on the next check
+                return None
+
+        if read_index_version() != version or any(s.index.ntotal != len(s.documents) for s in shards.values()):
+            # A seeder is mid-publish; keep serving the previous snapshot
+            return None
+        snapshot = IndexSnapshot(version, shards)
+        logger.info("🔌 FAISS index loaded into memory (%d shards, %d vectors).", len(shards), snapshot.ntotal)
+        return snapshot
+
+    def refresh(self, force: bool = False) -> IndexSnapshot:
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._loaded and now - self._last_check < self.reload_interval:
+                return self._snapshot
+            self._last_check = now
+            published = read_published()
+            if force or not self._loaded or published["version"] != self._snapshot.version:
+                snapshot = self._load(published)
+                if snapshot is not None:
+                    self._snapshot = snapshot
+                    self._loaded = True
+            return self._snapshot
+
+    def current(self) -> IndexSnapshot:
+        """The loaded snapshot, without checking for a newer version."""
+        return self._snapshot
+
+    def snapshot(self) -> IndexSnapshot:
+        """Return the current snapshot, reloading first if a new version is out."""
+        if self._loaded and time.monotonic() - self._last_check < self.reload_interval:
+            return self._snapshot
+        return self.refresh()
+
+
+_store: Optional[VectorStore] = None
+_store_lock = threading.Lock()
 
-def add_documents(docs):
-    index = load_faiss()
-    stored_docs = load_documents()
+def get_vector_store() -> VectorStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = VectorStore()
+    return _store
 
-    embeddings = model.encode([d["text"] for d in docs])
-    index.add(np.array(embeddings, dtype="float32"))
 
-    stored_docs.extend(docs)
-    save_documents(stored_docs)
-    save_faiss(index)
+# Index size, read from whatever snapshot is loaded at scrape time
+metrics.register_gauge("faiss_index_vectors", lambda: get_vector_store().current().ntotal)
+metrics.register_gauge("faiss_index_shards", lambda: len(get_vector_store().current().shards))
+metrics.register_gauge("faiss_doc_store_bytes", lambda: get_vector_store().current().doc_store_bytes())
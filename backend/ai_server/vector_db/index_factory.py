@@ -0,0 +1,194 @@
+"""
+FAISS index construction from `config.py`.
+
+`FAISS_INDEX_TYPE` selects the structure:
+- "flat"      exact brute-force scan (IndexFlatL2)
+- "hnsw"      graph search (IndexHNSWFlat; FAISS_HNSW_M, FAISS_HNSW_EF_SEARCH)
+- "ivf_flat"  inverted lists over exact vectors (FAISS_IVF_NLIST, FAISS_IVF_NPROBE)
+- "ivf_pq"    inverted lists over product-quantized codes (+ FAISS_PQ_M, FAISS_PQ_NBITS)
+- "sq_fp16"   exact scan over float16 vectors (half the memory of "flat")
+- "sq_int8"   exact scan over 8-bit scalar-quantized vectors (a quarter)
+- "pq"        exact scan over product-quantized codes (FAISS_PQ_M bytes per vector)
+
+With `FAISS_REFINE=true` the lossy types (sq_*, pq, ivf_pq) also keep the
+float32 vectors and re-rank their top `k * FAISS_REFINE_K_FACTOR` candidates
+exactly; that restores recall but gives back the memory saving.
+
+Every index accepts our own int64 vector ids (IVF natively, the others through
+IndexIDMap2) and can reconstruct stored vectors by id. IVF, int8 and PQ types
+need training, which `seed.py` does on a sample of up to `FAISS_TRAIN_SAMPLE`
+vectors before the first add. Search-time knobs (nprobe, efSearch) are applied on load, so
+they can be changed without re-seeding; structural ones need a re-seed.
+"""
+
+import math
+from typing import Optional
+
+import faiss
+import numpy as np
+
+from config import (
+    FAISS_INDEX_TYPE, FAISS_HNSW_M, FAISS_HNSW_EF_CONSTRUCTION, FAISS_HNSW_EF_SEARCH,
+    FAISS_IVF_NLIST, FAISS_IVF_NPROBE, FAISS_PQ_M, FAISS_PQ_NBITS, FAISS_TRAIN_SAMPLE,
+    FAISS_REFINE, FAISS_REFINE_K_FACTOR,
+)
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq", "sq_fp16", "sq_int8", "pq")
+# Types whose stored vectors are approximate, so an exact re-rank can help
+LOSSY_TYPES = ("ivf_pq", "sq_fp16", "sq_int8", "pq")
+# Default list count when the corpus size is not known yet
+DEFAULT_NLIST = 100
+
+
+def index_spec(index_type: Optional[str] = None) -> str:
+    """Structural parameters of the configured index; a change means a re-seed."""
+    t = (index_type or FAISS_INDEX_TYPE).lower()
+    if t == "hnsw":
+        spec = f"hnsw:M={FAISS_HNSW_M}"
+    elif t == "ivf_flat":
+        spec = f"ivf_flat:nlist={FAISS_IVF_NLIST or 'auto'}"
+    elif t == "ivf_pq":
+        spec = f"ivf_pq:nlist={FAISS_IVF_NLIST or 'auto'},m={FAISS_PQ_M},nbits={FAISS_PQ_NBITS}"
+    elif t == "pq":
+        spec = f"pq:m={FAISS_PQ_M},nbits={FAISS_PQ_NBITS}"
+    else:
+        spec = t
+    if FAISS_REFINE and t in LOSSY_TYPES:
+        spec += "+refine"
+    return spec
+
+
+def _nlist(n_vectors: Optional[int], nlist: int) -> int:
+    if n_vectors is None:
+        return nlist or DEFAULT_NLIST
+    if nlist:
+        return max(1, min(nlist, n_vectors))
+    # ~4·√n lists, with enough points per list for k-means to be meaningful
+    return max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // 39 or 1))
+
+
+def _pq_m(dim: int, m: int) -> int:
+    # Sub-quantizers must split the dimension evenly
+    m = max(1, min(m, dim))
+    while dim % m:
+        m -= 1
+    return m
+
+
+def build_index(dim: int, n_vectors: Optional[int] = None, index_type: Optional[str] = None, **params):
+    """Empty (possibly untrained) index for `dim`-dim vectors.
+
+    `n_vectors` is the expected training set size; it sizes nlist when that is
+    "auto" and keeps small corpora trainable. `params` override config values
+    (hnsw_m, ef_construction, nlist, pq_m, pq_nbits, refine) for benchmarking.
+    """
+    t = (index_type or FAISS_INDEX_TYPE).lower()
+    if t not in INDEX_TYPES:
+        raise ValueError(f"Unknown FAISS_INDEX_TYPE {t!r}; expected one of {INDEX_TYPES}")
+    refine = params.get("refine", FAISS_REFINE) and t in LOSSY_TYPES
+
+    nbits = params.get("pq_nbits", FAISS_PQ_NBITS)
+    if n_vectors is not None:
+        # Each sub-quantizer needs at least 2^nbits training points
+        nbits = max(1, min(nbits, int(math.log2(max(n_vectors, 2)))))
+    pq_m = _pq_m(dim, params.get("pq_m", FAISS_PQ_M))
+
+    if t == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif t == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, params.get("hnsw_m", FAISS_HNSW_M))
+        index.hnsw.efConstruction = params.get("ef_construction", FAISS_HNSW_EF_CONSTRUCTION)
+    elif t == "sq_fp16":
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_fp16)
+    elif t == "sq_int8":
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit)
+    elif t == "pq":
+        index = faiss.IndexPQ(dim, pq_m, nbits)
+    else:
+        nlist = _nlist(n_vectors, params.get("nlist", FAISS_IVF_NLIST))
+        quantizer = faiss.IndexFlatL2(dim)
+        if t == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, nbits)
+        if not refine:
+            # Lets vectors be reconstructed by id
+            index.set_direct_map_type(faiss.DirectMap.Hashtable)
+            return apply_search_params(index, **params)
+
+    if refine:
+        index = faiss.IndexRefineFlat(index)
+    index = faiss.IndexIDMap2(index)
+    return apply_search_params(index, **params)
+
+
+def _unwrap(index):
+    """The innermost index, below IndexIDMap2 / IndexRefineFlat wrappers."""
+    index = faiss.downcast_index(index)
+    while isinstance(index, (faiss.IndexIDMap, faiss.IndexRefine)):
+        index = faiss.downcast_index(index.base_index if isinstance(index, faiss.IndexRefine) else index.index)
+    return index
+
+
+def _refine_of(index):
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    return inner if isinstance(inner, faiss.IndexRefine) else None
+
+
+def apply_search_params(index, nprobe: Optional[int] = None, ef_search: Optional[int] = None,
+                        k_factor: Optional[float] = None, **_):
+    """Set query-time parameters (nprobe / efSearch / refine k_factor) on a loaded or new index."""
+    base = _unwrap(index)
+    if isinstance(base, faiss.IndexIVF):
+        base.nprobe = min(nprobe or FAISS_IVF_NPROBE, base.nlist)
+    if isinstance(base, faiss.IndexHNSW):
+        base.hnsw.efSearch = ef_search or FAISS_HNSW_EF_SEARCH
+    refine = _refine_of(index)
+    if refine is not None:
+        refine.k_factor = k_factor or FAISS_REFINE_K_FACTOR
+    return index
+
+
+def stores_exact_vectors(index) -> bool:
+    """Whether reconstructing from `index` gives back the original float32 vectors."""
+    return _refine_of(index) is not None or isinstance(_unwrap(index), (faiss.IndexFlat, faiss.IndexHNSWFlat, faiss.IndexIVFFlat))
+
+
+def train_index(index, vectors: np.ndarray, sample_size: int = FAISS_TRAIN_SAMPLE):
+    """Train `index` on a random sample of `vectors` (no-op for flat/HNSW/fp16)."""
+    if index.is_trained:
+        return
+    if len(vectors) > sample_size:
+        rows = np.random.default_rng(0).choice(len(vectors), sample_size, replace=False)
+        vectors = vectors[rows]
+    index.train(np.ascontiguousarray(vectors, dtype="float32"))
+
+
+def index_ids(index) -> np.ndarray:
+    """All vector ids stored in the index."""
+    if isinstance(index, faiss.IndexIDMap):
+        return faiss.vector_to_array(index.id_map).astype("int64")
+    ivf = faiss.try_extract_index_ivf(index)
+    invlists = ivf.invlists
+    return np.concatenate([
+        faiss.rev_swig_ptr(invlists.get_ids(l), invlists.list_size(l)).copy()
+        for l in range(ivf.nlist) if invlists.list_size(l)
+    ] or [np.zeros(0, dtype="int64")])
+
+
+def describe(index) -> str:
+    base = _unwrap(index)
+    kind, params = "flat", []
+    if isinstance(base, faiss.IndexIVF):
+        kind = "ivf_pq" if isinstance(base, faiss.IndexIVFPQ) else "ivf_flat"
+        params = [f"nlist={base.nlist}", f"nprobe={base.nprobe}"]
+    elif isinstance(base, faiss.IndexHNSW):
+        kind, params = "hnsw", [f"efSearch={base.hnsw.efSearch}"]
+    elif isinstance(base, faiss.IndexScalarQuantizer):
+        kind = "sq_fp16" if base.sq.qtype == faiss.ScalarQuantizer.QT_fp16 else "sq_int8"
+    elif isinstance(base, faiss.IndexPQ):
+        kind, params = "pq", [f"m={base.pq.M}"]
+    refine = _refine_of(index)
+    if refine is not None:
+        params.append(f"refine k_factor={refine.k_factor:g}")
+    return f"{kind}({', '.join(params + [f'ntotal={index.ntotal}'])})"
@@ -0,0 +1,44 @@
+"""
+Seeding manifest.
+
+Records, for every file in `DOCS_DIR` that has a shard, its size, mtime,
+content hash and vector count:
+
+    {"next_id": 1234, "pipeline_version": 3, "index_spec": "flat",
+     "files": {"Reddit_Title.csv": {"sha256": "...", "size": 560786,
+                                    "mtime_ns": ..., "vectors": 5606}}}
+
+`seed.py` uses it to skip unchanged files and to rebuild the shards of
+changed files. `next_id` keeps vector ids unique across shards, so search
+results from different shards can be merged.
+"""
+
+import hashlib
+import json
+import os
+
+from vector_db.faiss_client import atomic_replace
+
+MANIFEST_PATH = "faiss_manifest.json"
+
+
+def load_manifest() -> dict:
+    if os.path.exists(MANIFEST_PATH):
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {"next_id": 0, "pipeline_version": None, "files": {}}
+
+
+def save_manifest(manifest: dict):
+    def write(path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+    atomic_replace(MANIFEST_PATH, write)
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
@@ -1,36 +1,65 @@
+"""
+Mood from text, printed as JSON.
+
+    python model.py I feel tired and down
+    python model.py --serve
+
+`--serve` keeps one process warm: it reads one JSON request per line on stdin
+and writes one JSON line per request on stdout, in request order.
+
+    {"id": 1, "text": "so happy today"}          -> {"id": 1, "result": {...}}
+    {"id": 2, "texts": ["meh", "not great"]}     -> {"id": 2, "results": [{...}, {...}]}
+
+A bad line gets {"id": ..., "error": "..."} and the worker keeps going.
+"""
+
 import sys
 import json
+import os
+
+# The mood lexicon lives with the AI server so both give the same answers
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "ai_server"))
+
+from mood.lexicon import score_many
 
-text = " ".join(sys.argv[1:]).lower()
 
-mood = "Neutral"
-confidence = 70
-advice = "Maintain balance and stay consistent."
+def classify(texts):
+    return [
+        {"mood": r["mood"], "confidence": r["confidence"], "advice": r["advice"]}
+        for r in score_many(texts)
+    ]
 
-if any(word in text for word in ["sad", "depressed", "down", "tired"]):
-    mood = "Sad"
-    confidence = 92
-    advice = "Talk to someone you trust, take rest and avoid isolation."
 
-elif any(word in text for word in ["happy", "excited", "joy", "great"]):
-    mood = "Happy"
-    confidence = 95
-    advice = "Keep enjoying your positive moments!"
+def handle(line):
+    request_id = None
+    try:
+        request = json.loads(line)
+        if not isinstance(request, dict):
+            raise ValueError("request must be a JSON object")
+        request_id = request.get("id")
+        if "texts" in request:
+            texts = request["texts"]
+            if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+                raise ValueError("texts must be a list of strings")
+            return {"id": request_id, "results": classify(texts)}
+        text = request.get("text")
+        if not isinstance(text, str):
+            raise ValueError("text (or texts) is required")
+        return {"id": request_id, "result": classify([text])[0]}
+    except ValueError as e:  # includes JSONDecodeError
+        return {"id": request_id, "error": str(e)}
 
-elif any(word in text for word in ["angry", "frustrated", "irritated"]):
-    mood = "Angry"
-    confidence = 88
-    advice = "Try breathing exercises and take a break."
 
-elif any(word in text for word in ["anxious", "scared", "nervous"]):
-    mood = "Anxious"
-    confidence = 90
-    advice = "Practice grounding techniques and slow breathing."
+def serve(stdin=sys.stdin, stdout=sys.stdout):
+    for line in stdin:
+        if not line.strip():
+            continue
+        stdout.write(json.dumps(handle(line)) + "\n")
+        stdout.flush()
 
-result = {
-    "mood": mood,
-    "confidence": confidence,
-    "advice": advice
-}
 
-print(json.dumps(result))
+if __name__ == "__main__":
+    if sys.argv[1:] == ["--serve"]:
+        serve()
+    else:
+        print(json.dumps(classify([" ".join(sys.argv[1:])])[0]))
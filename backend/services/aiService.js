@@ -36,6 +36,14 @@ async function scoreText(text) {
   return resp.data; // { score, raw }
 }
 
+// Score many texts with one request to the Python AI server.
+// Results come back in input order: [{ score, raw } | { error }, ...]
+async function scoreTexts(texts) {
+  const url = `${AI_SERVER_URL.replace(/\/$/, '')}/score/batch`;
+  const resp = await axios.post(url, { texts }, { timeout: 120000 });
+  return resp.data.results;
+}
+
 async function generateAssessment(theme, numQuestions = 5) {
   // Try Node-side generation using Gemini if available
   try {
@@ -67,4 +75,4 @@ async function generateAssessment(theme, numQuestions = 5) {
   return resp.data; // { assessment, questions, raw }
 }
 
-module.exports = { scoreText, generateAssessment };
+module.exports = { scoreText, scoreTexts, generateAssessment };